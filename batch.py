@@ -0,0 +1,166 @@
+import numpy as np
+
+from cubie import CubieCube, MOVE_CUBES, N_MOVES, steps_to_moves
+
+############################################################
+##  Applying moves on many cubes at once with NumPy.
+############################################################
+# A batch of N cubes is held as two (N, 20) int8 arrays, perm and ori.
+# Columns 0-7 are the corner positions and columns 8-19 are the edge positions (in the order of corners and edges in rubik.py),
+# perm[n,i] is the piece at position i of the n-th cube (corner pieces are 0-7, edge pieces are 8-19),
+# and ori[n,i] is its orientation, exactly as cp/co/ep/eo of a CubieCube.
+# Moves are numbered as in cubie.py, and in move sequences given as (N, L) arrays a negative number means no move
+# (so sequences of different lengths can be padded).
+
+MOD = np.array([3]*8 + [2]*12, dtype=np.int8)
+
+def _tables():
+    '''Return the (N_MOVES+1, 20) source index and orientation change tables. The last row is the identity.'''
+    src = np.empty((N_MOVES+1, 20), dtype=np.intp)
+    delta = np.zeros((N_MOVES+1, 20), dtype=np.int8)
+    for m, cc in enumerate(MOVE_CUBES):
+        src[m, :8] = cc.cp
+        src[m, 8:] = np.array(cc.ep) + 8
+        delta[m, :8] = cc.co
+        delta[m, 8:] = cc.eo
+    src[N_MOVES] = np.arange(20)
+    return src, delta
+
+SRC, DELTA = _tables()
+
+def solved(n):
+    '''Return perm, ori of n solved cubes.'''
+    return np.tile(np.arange(20, dtype=np.int8), (n, 1)), np.zeros((n, 20), dtype=np.int8)
+
+def apply_move(perm, ori, move):
+    '''Make the same move on every cube of the batch, return the new perm, ori.'''
+    src = SRC[move]
+    return perm[:, src], (ori[:, src] + DELTA[move]) % MOD
+
+def apply_moves(perm, ori, moves):
+    '''Make the same sequence of moves on every cube of the batch, return the new perm, ori.'''
+    for m in moves:
+        perm, ori = apply_move(perm, ori, m)
+    return perm, ori
+
+def apply_sequences(perm, ori, sequences):
+    '''Make a different sequence of moves on each cube, given as an (N, L) array (row n is applied on the n-th cube).
+    Negative entries are skipped. Return the new perm, ori.'''
+    sequences = np.asarray(sequences)
+    # The pieces are gathered from the flattened arrays (faster than take_along_axis), and since ori + DELTA < 2 * MOD,
+    # the modulo is a conditional subtraction.
+    offsets = (20 * np.arange(len(perm), dtype=np.intp))[:, None]
+    for col in sequences.T:
+        moves = np.where(col < 0, N_MOVES, col)
+        src = SRC[moves] + offsets
+        perm = perm.ravel()[src]
+        ori = ori.ravel()[src] + DELTA[moves]
+        ori -= MOD * (ori >= MOD)
+    return perm, ori
+
+def multiply(perm, ori, perm2, ori2):
+    '''Apply the transformations perm2, ori2 after perm, ori (row by row, like CubieCube.multiply), return the new perm, ori.'''
+    src = perm2.astype(np.intp)
+    return np.take_along_axis(perm, src, axis=1), (np.take_along_axis(ori, src, axis=1) + ori2) % MOD
+
+def inverse(perm, ori):
+    '''Return perm, ori of the inverse transformations of the cubes (like CubieCube.inverse).'''
+    rows = np.arange(len(perm))[:, None]
+    src = perm.astype(np.intp)
+    inv_perm = np.empty_like(perm)
+    inv_ori = np.empty_like(ori)
+    inv_perm[rows, src] = np.arange(20, dtype=perm.dtype)
+    inv_ori[rows, src] = (MOD - ori) % MOD
+    return inv_perm, inv_ori
+
+def pad_sequences(sequences):
+    '''Convert sequences of CW-rotations (tuples of side_nos) to an (N, L) int8 array of move numbers padded with -1, for apply_sequences.'''
+    moves = [steps_to_moves(steps) for steps in sequences]
+    result = np.full((len(moves), max(map(len, moves), default=0)), -1, dtype=np.int8)
+    for i, m in enumerate(moves):
+        result[i, :len(m)] = m
+    return result
+
+def is_solved(perm, ori):
+    '''Return a boolean array telling which cubes of the batch are solved.'''
+    return (perm == np.arange(20)).all(axis=1) & (ori == 0).all(axis=1)
+
+
+
+############################################################
+##  Conversions and random mixing.
+############################################################
+
+def from_cubie(cubie_cubes):
+    '''Convert a sequence of CubieCubes to perm, ori.'''
+    n = len(cubie_cubes)
+    perm = np.empty((n, 20), dtype=np.int8)
+    ori = np.empty((n, 20), dtype=np.int8)
+    for i, cc in enumerate(cubie_cubes):
+        perm[i, :8] = cc.cp
+        perm[i, 8:] = np.array(cc.ep) + 8
+        ori[i, :8] = cc.co
+        ori[i, 8:] = cc.eo
+    return perm, ori
+
+def to_cubie(perm, ori):
+    '''Yield the cubes of the batch as CubieCubes.'''
+    for p, o in zip(perm.tolist(), ori.tolist()):
+        yield CubieCube(p[:8], o[:8], [e - 8 for e in p[8:]], o[8:])
+
+def from_dicts(states):
+    '''Convert a sequence of my_cube-like dicts to perm, ori.'''
+    return from_cubie([CubieCube.from_dict(s) for s in states])
+
+def to_dicts(perm, ori):
+    '''Yield the cubes of the batch as my_cube-like dicts.'''
+    for cc in to_cubie(perm, ori):
+        yield cc.to_dict()
+
+def random_sequences(n, number_of_steps=1000, rng=None):
+    '''Return an (n, number_of_steps) array of random CW-rotations, like the random mixing in rubik.py.'''
+    rng = np.random.default_rng(rng)
+    return (3 * rng.integers(0, 6, size=(n, number_of_steps))).astype(np.int8)
+
+def random_batch(n, number_of_steps=1000, rng=None):
+    '''Return perm, ori of n cubes, each mixed by number_of_steps random CW-rotations.'''
+    perm, ori = solved(n)
+    return apply_sequences(perm, ori, random_sequences(n, number_of_steps, rng))
+
+def random_cubes(n, number_of_steps=1000, rng=None):
+    '''Return a list of n my_cube-like dicts mixed randomly, the batch version of random_cube in rubik.py.'''
+    return list(to_dicts(*random_batch(n, number_of_steps, rng)))
+
+
+
+############################################################
+##  Checking many cubes at once.
+############################################################
+
+# The reason codes returned by check, the names are the keys of INVALID_REASONS in rubik.py (0 means a real cube).
+CHECK_REASONS = (None, 'piece', 'duplicate', 'twist', 'flip', 'parity')
+
+def parities(perm):
+    '''Return the parities of the permutations in the rows of perm, by counting the inversions.'''
+    n = perm.shape[1]
+    inversions = np.zeros(len(perm), dtype=np.int64)
+    for i in range(n-1):
+        inversions += (perm[:, i+1:] < perm[:, i:i+1]).sum(axis=1)
+    return inversions % 2
+
+def check(perm, ori):
+    '''Return an int8 array of reason codes (indices into CHECK_REASONS) telling which cubes of the batch are real cubes (0) and why the others are not.
+    If a cube is wrong for more reasons, the first one in CHECK_REASONS is given.'''
+    perm, ori = perm.astype(np.int64), ori.astype(np.int64)
+    cp, ep = perm[:, :8], perm[:, 8:]
+    wrong = (
+        ((cp < 0) | (cp > 7)).any(axis=1) | ((ep < 8) | (ep > 19)).any(axis=1) | (ori < 0).any(axis=1) | (ori >= MOD).any(axis=1),
+        (np.sort(perm, axis=1) != np.arange(20)).any(axis=1),
+        ori[:, :8].sum(axis=1) % 3 != 0,
+        ori[:, 8:].sum(axis=1) % 2 != 0,
+        parities(cp) != parities(ep),
+    )
+    codes = np.zeros(len(perm), dtype=np.int8)
+    for code in range(len(wrong), 0, -1):
+        codes[wrong[code-1]] = code
+    return codes
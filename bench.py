@@ -0,0 +1,153 @@
+import argparse
+import json
+import random
+import sys
+import time
+
+import rubik
+from cubie import CubieCube
+
+############################################################
+##  Benchmarks.
+############################################################
+# Every benchmark uses a fixed seed, so the same work is measured on every run.
+# The results are printed (or written to --output) as JSON, and with --baseline they are compared to an earlier result:
+# if any throughput (a key ending with _per_sec) drops more than --threshold (relative) below the baseline, the exit code is 1.
+
+def _timed(function, *args):
+    '''Return the result of function(*args) and the elapsed seconds.'''
+    start = time.perf_counter()
+    result = function(*args)
+    return result, time.perf_counter() - start
+
+def bench_moves(n_moves, seed):
+    '''Throughput of cw_rot on the dict, and of the move tables of CubieCube.'''
+    rng = random.Random(seed)
+    steps = tuple(rng.randint(1,6) for i in range(n_moves))
+    state_of_cube = rubik.solved_cube()
+    _, t = _timed(rubik.cw_rot, state_of_cube, steps)
+    result = {'cw_rot_moves_per_sec': n_moves / t}
+    cc = CubieCube()
+    _, t = _timed(cc.cw_rot, steps)
+    result['cubie_moves_per_sec'] = n_moves / t
+    return result
+
+def bench_batch_moves(n_cubes, n_moves, seed):
+    '''Throughput of the NumPy batch engine, in moves (cubes x moves) per second. Empty if NumPy is not installed.'''
+    try:
+        import batch
+    except ImportError:
+        return {}
+    sequences = batch.random_sequences(n_cubes, n_moves, seed)
+    _, t = _timed(batch.apply_sequences, *batch.solved(n_cubes), sequences)
+    return {'batch_moves_per_sec': n_cubes * n_moves / t}
+
+def bench_scramble(n_cubes, seed):
+    '''Throughput of random_cube (1000 random CW-rotations each).'''
+    random.seed(seed)
+    _, t = _timed(lambda: [rubik.random_cube() for i in range(n_cubes)])
+    return {'scrambles_per_sec': n_cubes / t}
+
+def bench_uniform_scramble(n_cubes, seed):
+    '''Throughput of the uniformly random cubes of scramble.py, as dicts and as NumPy batches. Empty if NumPy is not installed.'''
+    try:
+        import scramble
+    except ImportError:
+        return {}
+    _, t = _timed(scramble.random_states, n_cubes, seed)
+    result = {'uniform_scrambles_per_sec': n_cubes / t}
+    _, t = _timed(scramble.random_batch, 100 * n_cubes, seed)
+    result['uniform_batch_scrambles_per_sec'] = 100 * n_cubes / t
+    return result
+
+def bench_verify(n_cubes, seed):
+    '''Logged solutions checked per second against their scrambles (100 CW-rotations each), one by one and as NumPy batches.
+    Empty if NumPy is not installed.'''
+    try:
+        import verify
+    except ImportError:
+        return {}
+    rng = random.Random(seed)
+    scrambles = [tuple(rng.randint(1,6) for i in range(100)) for j in range(n_cubes)]
+    solutions = [tuple(s for s in reversed(steps) for i in range(3)) for steps in scrambles]
+    _, t = _timed(lambda: [verify.solves_scramble(a, b) for a, b in zip(scrambles, solutions)])
+    result = {'verifications_per_sec': n_cubes / t}
+    _, t = _timed(verify.verify_log, scrambles, solutions)
+    result['batch_verifications_per_sec'] = n_cubes / t
+    return result
+
+def corpus(n_cubes, seed):
+    '''Yield n_cubes random cubes, always the same ones for the same seed.'''
+    rng = random.Random(seed)
+    for i in range(n_cubes):
+        state_of_cube = rubik.solved_cube()
+        rubik.cw_rot(state_of_cube, tuple(rng.randint(1,6) for i in range(100)))
+        yield state_of_cube
+
+def bench_solve(n_cubes, seed):
+    '''End-to-end solves per second, and the wall time and number of CW-rotations of each of STEP 1 - STEP 7.'''
+    stage_time = [0.0] * len(rubik.STAGES)
+    stage_moves = [0] * len(rubik.STAGES)
+    total = 0.0
+    for state in corpus(n_cubes, seed):
+        start = time.perf_counter()
+        rubik.check_cube(state)
+        state_of_cube = dict(state)
+        for i, stage in enumerate(rubik.STAGES):
+            stage_start = time.perf_counter()
+            for steps, _ in stage(state_of_cube):
+                stage_moves[i] += len(steps)
+            stage_time[i] += time.perf_counter() - stage_start
+        total += time.perf_counter() - start
+    return {
+        'solves_per_sec': n_cubes / total,
+        'moves_per_solve': sum(stage_moves) / n_cubes,
+        'stages': [{'stage': i + 1, 'seconds': stage_time[i], 'seconds_per_solve': stage_time[i] / n_cubes,
+                    'moves_per_solve': stage_moves[i] / n_cubes} for i in range(len(rubik.STAGES))],
+    }
+
+def run(n_cubes=1000, n_moves=100000, seed=0):
+    '''Run all the benchmarks, return the results as a dict.'''
+    results = {'config': {'cubes': n_cubes, 'moves': n_moves, 'seed': seed, 'python': sys.version.split()[0]}}
+    results.update(bench_moves(n_moves, seed))
+    results.update(bench_batch_moves(max(1, n_moves // 100), 100, seed))
+    results.update(bench_scramble(max(1, n_cubes // 10), seed))
+    results.update(bench_uniform_scramble(n_cubes, seed))
+    results.update(bench_verify(n_cubes, seed))
+    results.update(bench_solve(n_cubes, seed))
+    return results
+
+def regressions(results, baseline, threshold):
+    '''Return the list of (key, baseline value, new value) of the throughputs which dropped more than threshold below the baseline.'''
+    return [(k, v, results[k]) for k, v in baseline.items()
+            if k.endswith('_per_sec') and k in results and results[k] < (1 - threshold) * v]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmarks of the solver.')
+    parser.add_argument('--cubes', type=int, default=1000, help='number of cubes solved (e.g. 100000 for a full run)')
+    parser.add_argument('--moves', type=int, default=100000, help='number of moves made in the move benchmarks')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help='write the JSON results to this file')
+    parser.add_argument('--baseline', help='JSON results of an earlier run to compare with')
+    parser.add_argument('--threshold', type=float, default=0.1, help='allowed relative drop of throughput compared to the baseline')
+    args = parser.parse_args()
+
+    results = run(args.cubes, args.moves, args.seed)
+    text = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f: f.write(text + '\n')
+    else:
+        print(text)
+
+    if args.baseline:
+        with open(args.baseline) as f: baseline = json.load(f)
+        failed = regressions(results, baseline, args.threshold)
+        for k, old, new in failed:
+            print('REGRESSION %s: %.1f -> %.1f (%.1f%%)' % (k, old, new, 100 * (new - old) / old), file=sys.stderr)
+        if failed:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
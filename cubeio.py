@@ -0,0 +1,182 @@
+import mmap
+import os
+import struct
+
+from rubik import corners, edges, color_to_num, solve
+from cubie import CubieCube, N_MOVES, steps_to_moves, moves_to_steps
+
+############################################################
+##  Facelet strings.
+############################################################
+# The standard 54 character facelet string lists the facelets of the sides U, R, F, D, L, B (in this order), 9 facelets per side row by row,
+# each side seen from outside with U at the top (for U itself: B at the top, for D: F at the top).
+# Each character names the color of a facelet, it can be either a side name (URFDLB) or a color (WOGBRY) - the 6 centers define the meaning.
+# We hold the cube with White up and Green in front, so U, R, F, D, L, B are the sides 1, 5, 3, 6, 2, 4.
+
+FACELET_SIDES = 'URFDLB'
+SIDE_OF_FACE = {'U': 1, 'R': 5, 'F': 3, 'D': 6, 'L': 2, 'B': 4}
+CENTERS = (4, 13, 22, 31, 40, 49)
+
+# The facelet indices of each corner and edge position, keyed by the set of its sides.
+_CORNER_FACELETS = ( {'U': 8, 'R': 9, 'F': 20}, {'U': 6, 'F': 18, 'L': 38}, {'U': 0, 'L': 36, 'B': 47}, {'U': 2, 'B': 45, 'R': 11},
+                     {'D': 29, 'F': 26, 'R': 15}, {'D': 27, 'L': 44, 'F': 24}, {'D': 33, 'B': 53, 'L': 42}, {'D': 35, 'R': 17, 'B': 51} )
+_EDGE_FACELETS = ( {'U': 5, 'R': 10}, {'U': 7, 'F': 19}, {'U': 3, 'L': 37}, {'U': 1, 'B': 46},
+                   {'D': 32, 'R': 16}, {'D': 28, 'F': 25}, {'D': 30, 'L': 43}, {'D': 34, 'B': 52},
+                   {'F': 23, 'R': 12}, {'F': 21, 'L': 41}, {'B': 50, 'L': 39}, {'B': 48, 'R': 14} )
+
+def _facelets_of_keys(keys, positions):
+    by_sides = {frozenset(SIDE_OF_FACE[f] for f in pos): {SIDE_OF_FACE[f]: i for f, i in pos.items()} for pos in positions}
+    return {key: tuple(by_sides[frozenset(key)][side] for side in key) for key in keys}
+
+# FACELETS[key][j] is the index of the facelet on side key[j] of the position key.
+FACELETS = _facelets_of_keys(corners, _CORNER_FACELETS)
+FACELETS.update(_facelets_of_keys(edges, _EDGE_FACELETS))
+
+def from_facelets(facelets):
+    '''Convert a 54 character facelet string to a my_cube-like dict.'''
+    facelets = facelets.strip()
+    if len(facelets) != 54:
+        raise ValueError('A facelet string has 54 characters, not %d' % len(facelets))
+    side_of_char = {facelets[c]: SIDE_OF_FACE[f] for f, c in zip(FACELET_SIDES, CENTERS)}
+    if len(side_of_char) != 6:
+        raise ValueError('The centers of a facelet string have to be different')
+    try:
+        return {key: tuple(side_of_char[facelets[i]] for i in inds) for key, inds in FACELETS.items()}
+    except KeyError as e:
+        raise ValueError('Unknown facelet color: ' + str(e))
+
+def to_facelets(state_of_cube, colors=False):
+    '''Convert a my_cube-like dict to a facelet string, using side names (URFDLB) or if colors is True, color letters (WOGBRY).'''
+    num_to_char = {num: c for c, num in color_to_num.items()} if colors else {num: f for f, num in SIDE_OF_FACE.items()}
+    facelets = [None]*54
+    for f, c in zip(FACELET_SIDES, CENTERS):
+        facelets[c] = num_to_char[SIDE_OF_FACE[f]]
+    for key, inds in FACELETS.items():
+        for i, side_no in zip(inds, state_of_cube[key]):
+            facelets[i] = num_to_char[side_no]
+    return ''.join(facelets)
+
+def read_facelet_file(path):
+    '''Yield the cubes of a text file with one facelet string per line (empty lines are skipped) as my_cube-like dicts.
+    The file is memory-mapped, so it is not loaded into memory.'''
+    with open(path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0: return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            for line in iter(mm.readline, b''):
+                line = line.strip()
+                if line:
+                    yield from_facelets(line.decode('ascii'))
+
+def write_facelet_file(path, states, colors=False):
+    '''Write the cubes of an iterable of my_cube-like dicts to a text file, one facelet string per line. Return the number of cubes.'''
+    n = 0
+    with open(path, 'w') as f:
+        for state_of_cube in states:
+            f.write(to_facelets(state_of_cube, colors) + '\n')
+            n += 1
+    return n
+
+
+
+############################################################
+##  Binary files of cubes and solutions.
+############################################################
+# A file is a header followed by fixed-size records, so the i-th record is at HEADER.size + i*record size.
+#   header          - magic (b'RUBIKCUB' for cubes, b'RUBIKSOL' for solutions), format version, size of a record
+#   cube record     - 20 bytes, one per position in the order of corners + edges:
+#                     piece*3 + twist for the corners (as cp, co of a CubieCube), piece*2 + flip for the edges (as ep, eo)
+#   solution record - the number of moves (uint16) and the move numbers of cubie.py (one byte each), padded with zeros to MAX_SOLUTION_MOVES
+# The i-th solution of a solution file belongs to the i-th cube of the cube file it was made from.
+# The readers are generators over the memory-mapped file, so files much larger than the memory can be processed.
+
+FORMAT_VERSION = 1
+HEADER = struct.Struct('<8sHH')
+CUBE_MAGIC = b'RUBIKCUB'
+SOLUTION_MAGIC = b'RUBIKSOL'
+CUBE_RECORD_SIZE = 20
+MAX_SOLUTION_MOVES = 510
+SOLUTION_RECORD = struct.Struct('<H%ds' % MAX_SOLUTION_MOVES)
+
+def pack_cube(state_of_cube):
+    '''Return the binary record of a my_cube-like dict.'''
+    cc = CubieCube.from_dict(state_of_cube)
+    return bytes([3*p + o for p, o in zip(cc.cp, cc.co)] + [2*p + o for p, o in zip(cc.ep, cc.eo)])
+
+def unpack_cube(record):
+    '''Return the my_cube-like dict of a binary record.'''
+    if len(record) != CUBE_RECORD_SIZE or max(record) >= 24:
+        raise ValueError('Invalid cube record')
+    return CubieCube([b // 3 for b in record[:8]], [b % 3 for b in record[:8]],
+                     [b // 2 for b in record[8:]], [b % 2 for b in record[8:]]).to_dict()
+
+def pack_solution(steps):
+    '''Return the binary record of a solution, given as steps (CW-rotations).'''
+    moves = steps_to_moves(steps)
+    if len(moves) > MAX_SOLUTION_MOVES:
+        raise ValueError('A solution record holds at most %d moves, not %d' % (MAX_SOLUTION_MOVES, len(moves)))
+    return SOLUTION_RECORD.pack(len(moves), bytes(moves))
+
+def unpack_solution(record):
+    '''Return the steps (CW-rotations) of a binary solution record.'''
+    n, moves = SOLUTION_RECORD.unpack(record)
+    if n > MAX_SOLUTION_MOVES or max(moves[:n], default=0) >= N_MOVES:
+        raise ValueError('Invalid solution record')
+    return moves_to_steps(moves[:n])
+
+def write_records(path, magic, record_size, records):
+    '''Write a header and the records (bytes of record_size) of an iterable to path. Return the number of records.'''
+    n = 0
+    with open(path, 'wb') as f:
+        f.write(HEADER.pack(magic, FORMAT_VERSION, record_size))
+        for record in records:
+            f.write(record)
+            n += 1
+    return n
+
+def read_records(path, magic, record_size):
+    '''Yield the records of a file written by write_records, checking its header.'''
+    with open(path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size < HEADER.size:
+            raise ValueError('%s is not a %s file' % (path, magic.decode()))
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            file_magic, version, size = HEADER.unpack_from(mm)
+            if file_magic != magic:
+                raise ValueError('%s is not a %s file' % (path, magic.decode()))
+            if version != FORMAT_VERSION or size != record_size:
+                raise ValueError('%s has format version %d and record size %d, expected %d and %d'
+                                 % (path, version, size, FORMAT_VERSION, record_size))
+            if (len(mm) - HEADER.size) % record_size:
+                raise ValueError('%s ends with an incomplete record' % path)
+            for offset in range(HEADER.size, len(mm), record_size):
+                yield mm[offset:offset+record_size]
+
+def write_cubes(path, states):
+    '''Write the cubes of an iterable of my_cube-like dicts to a binary cube file. Return the number of cubes.'''
+    return write_records(path, CUBE_MAGIC, CUBE_RECORD_SIZE, (pack_cube(s) for s in states))
+
+def read_cubes(path):
+    '''Yield the cubes of a binary cube file as my_cube-like dicts.'''
+    for record in read_records(path, CUBE_MAGIC, CUBE_RECORD_SIZE):
+        yield unpack_cube(record)
+
+def count_records(path):
+    '''Return the number of records of a binary cube or solution file, from its size.'''
+    with open(path, 'rb') as f:
+        magic, _, size = HEADER.unpack(f.read(HEADER.size))
+        if magic not in (CUBE_MAGIC, SOLUTION_MAGIC):
+            raise ValueError('%s is not a cube or solution file' % path)
+        return (os.fstat(f.fileno()).st_size - HEADER.size) // size
+
+def write_solutions(path, solutions):
+    '''Write an iterable of solutions (steps) to a binary solution file. Return the number of solutions.'''
+    return write_records(path, SOLUTION_MAGIC, SOLUTION_RECORD.size, (pack_solution(s) for s in solutions))
+
+def read_solutions(path):
+    '''Yield the solutions (steps) of a binary solution file.'''
+    for record in read_records(path, SOLUTION_MAGIC, SOLUTION_RECORD.size):
+        yield unpack_solution(record)
+
+def solve_file(cubes_path, solutions_path, solver=solve):
+    '''Solve the cubes of a binary cube file one by one, streaming the solutions to a binary solution file. Return the number of cubes.
+    For many processes, write_solutions(solutions_path, SolverPool().map(read_cubes(cubes_path))) does the same.'''
+    return write_solutions(solutions_path, (solver(s) for s in read_cubes(cubes_path)))
@@ -0,0 +1,202 @@
+from array import array
+from math import gcd
+from operator import getitem, itemgetter, xor
+
+from rubik import corners, edges, key_form, shift, shift_power, cw_1_rot, solved_cube
+
+############################################################
+##  A compact representation of the cube, on the level of pieces (cubies)
+############################################################
+# The positions of the corners/edges are enumerated in the order of the corners/edges tuples.
+# cp[i] is the index of the corner piece which is at position i, and co[i] is its orientation:
+# my_cube[corners[i]] == shift(corners[cp[i]], co[i]) in the dict representation. The same holds for ep, eo and edges.
+# The moves are enumerated as 3*(side_no-1) + (power-1), where power is the number of CW-rotations (1, 2 or 3) of side side_no.
+
+N_MOVES = 18
+
+def move_no(side_no,power=1):
+    '''Return the number of the move which makes power CW-rotations on side side_no.'''
+    return 3*(side_no-1) + (power-1)
+
+def move_side_power(move):
+    '''Return (side_no, power) of a move number.'''
+    return move // 3 + 1, move % 3 + 1
+
+
+class CubieCube:
+    '''State of the cube as corner/edge permutation and orientation arrays.'''
+    __slots__ = ('cp', 'co', 'ep', 'eo')
+
+    def __init__(self, cp=None, co=None, ep=None, eo=None):
+        self.cp = array('B', range(8) if cp is None else cp)
+        self.co = array('B', bytes(8) if co is None else co)
+        self.ep = array('B', range(12) if ep is None else ep)
+        self.eo = array('B', bytes(12) if eo is None else eo)
+
+    @classmethod
+    def from_dict(cls, state_of_cube):
+        '''Convert a my_cube-like dict to a CubieCube.'''
+        cp, co, ep, eo = [], [], [], []
+        for c in corners:
+            val = state_of_cube[c]
+            piece = key_form(val)
+            cp.append(corners.index(piece))
+            co.append(shift_power(piece, val))
+        for e in edges:
+            val = state_of_cube[e]
+            piece = key_form(val)
+            ep.append(edges.index(piece))
+            eo.append(0 if piece == val else 1)
+        return cls(cp, co, ep, eo)
+
+    def to_dict(self):
+        '''Convert the CubieCube to a my_cube-like dict.'''
+        state_of_cube = {corners[i]: shift(corners[self.cp[i]], self.co[i]) for i in range(8)}
+        state_of_cube.update({edges[i]: shift(edges[self.ep[i]], self.eo[i]) for i in range(12)})
+        return state_of_cube
+
+    def copy(self):
+        return CubieCube(self.cp, self.co, self.ep, self.eo)
+
+    def __eq__(self, other):
+        return (self.cp == other.cp and self.co == other.co and self.ep == other.ep and self.eo == other.eo)
+
+    def __hash__(self):
+        return hash((self.cp.tobytes(), self.co.tobytes(), self.ep.tobytes(), self.eo.tobytes()))
+
+    def __repr__(self):
+        return 'CubieCube(%s, %s, %s, %s)' % (list(self.cp), list(self.co), list(self.ep), list(self.eo))
+
+    def is_solved(self):
+        return self == SOLVED
+
+    def multiply(self, other):
+        '''Apply the transformation other (given as a CubieCube) after self, in place.'''
+        cp, co, ep, eo = self.cp, self.co, self.ep, self.eo
+        self.cp = array('B', [cp[j] for j in other.cp])
+        self.co = array('B', [(co[j] + o) % 3 for j, o in zip(other.cp, other.co)])
+        self.ep = array('B', [ep[j] for j in other.ep])
+        self.eo = array('B', [eo[j] ^ o for j, o in zip(other.ep, other.eo)])
+
+    def __mul__(self, other):
+        '''Return the transformation self followed by other.'''
+        cc = self.copy()
+        cc.multiply(other)
+        return cc
+
+    def inverse(self):
+        '''Return the transformation undoing self: self * self.inverse() is the solved cube.'''
+        cc = CubieCube()
+        for i, (p, o) in enumerate(zip(self.cp, self.co)):
+            cc.cp[p] = i
+            cc.co[p] = (3 - o) % 3
+        for i, (p, o) in enumerate(zip(self.ep, self.eo)):
+            cc.ep[p] = i
+            cc.eo[p] = o
+        return cc
+
+    def order(self):
+        '''Return the least n > 0 such that repeating the transformation n times gives the solved cube.
+        A cycle of the pieces comes back after its length, or 3 (2) times its length if the twists (flips) along it do not cancel.'''
+        result = 1
+        for perm, ori, mod in ((self.cp, self.co, 3), (self.ep, self.eo, 2)):
+            seen = [False]*len(perm)
+            for start in range(len(perm)):
+                i, length, twist = start, 0, 0
+                while not seen[i]:
+                    seen[i] = True
+                    twist += ori[i]
+                    i = perm[i]
+                    length += 1
+                if length:
+                    length *= 1 if twist % mod == 0 else mod
+                    result = result * length // gcd(result, length)
+        return result
+
+    def _transform(self, tables):
+        '''Apply the transformations given by tables (see _table) one after the other, in place.
+        The pieces are kept in tuples meanwhile, and converted back to arrays only at the end.'''
+        cp, co, ep, eo = self.cp, self.co, self.ep, self.eo
+        for c_get, c_add, e_get, e_ori in tables:
+            cp = c_get(cp)
+            co = tuple(map(getitem, c_add, c_get(co)))
+            ep = e_get(ep)
+            eo = tuple(map(xor, e_get(eo), e_ori))
+        self.cp, self.co, self.ep, self.eo = array('B', cp), array('B', co), array('B', ep), array('B', eo)
+
+    def move(self, move):
+        '''Make the move with the given move number, in place.'''
+        self._transform((MOVE_TABLES[move],))
+
+    def apply(self, moves):
+        '''Make the moves (move numbers) one after the other, in place. Two moves are made at once (see PAIR_TABLES).'''
+        # int() so that NumPy integers (e.g. uint8) can't overflow in the index.
+        moves = [int(m) for m in moves]
+        tables = [PAIR_TABLES[N_MOVES*moves[i] + moves[i+1]] for i in range(0, len(moves) - 1, 2)]
+        if len(moves) % 2:
+            tables.append(MOVE_TABLES[moves[-1]])
+        self._transform(tables)
+
+    @classmethod
+    def from_moves(cls, moves):
+        '''Compile moves (move numbers) into a single transformation.'''
+        cc = cls()
+        cc.apply(moves)
+        return cc
+
+    @classmethod
+    def from_steps(cls, steps):
+        '''Compile CW-rotations (side_nos, as returned by the solver functions in rubik.py) into a single transformation.'''
+        return cls.from_moves(steps_to_moves(steps))
+
+    def cw_rot(self, side_nos):
+        '''Make one or more CW-rotation, like cw_rot in rubik.py, in place.'''
+        self.apply(steps_to_moves(side_nos))
+
+
+ADD_3 = tuple(tuple((a+b) % 3 for b in range(3)) for a in range(3))
+SOLVED = CubieCube()
+
+def _table(cc):
+    '''Return the transformation cc as (getter of the corner permutation, the rows of ADD_3 adding the corner orientation changes,
+    getter of the edge permutation, edge orientation changes).'''
+    return (itemgetter(*cc.cp), tuple(ADD_3[o] for o in cc.co), itemgetter(*cc.ep), tuple(cc.eo))
+
+def _move_cubes():
+    '''Compute each move applied on the solved cube from cw_1_rot.'''
+    cubes = []
+    for side_no in range(1,7):
+        state_of_cube = solved_cube()
+        for power in range(1,4):
+            cw_1_rot(state_of_cube, side_no)
+            cubes.append(CubieCube.from_dict(state_of_cube))
+    return tuple(cubes)
+
+# MOVE_CUBES[move] is the move applied on the solved cube.
+MOVE_CUBES = _move_cubes()
+# MOVE_TABLES[move] is the table (see _table) of a move.
+MOVE_TABLES = tuple(_table(cc) for cc in MOVE_CUBES)
+# PAIR_TABLES[N_MOVES*m1 + m2] is the table of the move m1 followed by m2.
+PAIR_TABLES = tuple(_table(MOVE_CUBES[m1] * MOVE_CUBES[m2]) for m1 in range(N_MOVES) for m2 in range(N_MOVES))
+
+def steps_to_moves(steps):
+    '''Convert a tuple of CW-rotations (side_nos, as returned by the solver functions in rubik.py) to move numbers,
+    merging the consecutive rotations of the same side.'''
+    moves = []
+    i = 0
+    while i < len(steps):
+        p = 1
+        while i+p < len(steps) and steps[i+p] == steps[i]:
+            p += 1
+        if p % 4 > 0:
+            moves.append(move_no(int(steps[i]), p % 4))
+        i += p
+    return moves
+
+def moves_to_steps(moves):
+    '''Convert move numbers to a tuple of CW-rotations (side_nos).'''
+    steps = []
+    for m in moves:
+        side_no, power = move_side_power(m)
+        steps.extend([side_no]*power)
+    return tuple(steps)
@@ -0,0 +1,227 @@
+import argparse
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from itertools import permutations, product
+
+import numpy as np
+
+import rubik
+from cubie import CubieCube, MOVE_CUBES, N_MOVES
+from simplify import face_turns
+from twophase import N_FLIP, N_SLICE, N_TWIST, SLICE_SOLVED, _flip_move_table, _perm_move_table, _slice_move_table, _twist_move_table
+
+############################################################
+##  Breadth-first exploration of subgroups.
+############################################################
+# A subgroup (or coset space) is given by coordinates: a tuple of move tables, the i-th of shape (n_i, N_MOVES), and the index of the goal.
+# A state is the mixed-radix number of its coordinates (the first coordinate is the most significant), so there are n_0 * n_1 * ... states.
+# The search counts the states at each distance (in face turns, any of the 18 moves of cubie.py) from the goal.
+#
+# The store holds 2 bits per state, 4 states per byte: 3 for unvisited, otherwise the distance mod 3. A level is expanded from the states
+# with code depth % 3; these include the states at depth - 3, depth - 6, ..., whose neighbours are all visited already, so they do no harm.
+# The number of states at a depth is counted as the growth of the number of visited states.
+#
+# The store is a file (memory-mapped), and after each level the depth and the histogram are written to path + '.json'.
+# A run started with the same path continues from the last finished level, and a level which was interrupted is simply expanded again.
+# With more processes the frontier is split into ranges of the store, each expanded by a worker reading the store memory-mapped;
+# the parent sets the new states.
+
+UNVISITED = 3
+CHUNK_BYTES = 1 << 18
+# The number of visited states (codes other than 3) in each byte. The codes after the last state stay 3.
+VISITED_IN_BYTE = np.array([sum(((b >> (2*s)) & 3) != UNVISITED for s in range(4)) for b in range(256)], dtype=np.int64)
+
+def corner_perm_move_table():
+    '''Move table of the permutation of the corners for all 18 moves.'''
+    return _perm_move_table(8, [list(mc.cp) for mc in MOVE_CUBES])
+
+def subgroup(name):
+    '''Return the move tables and the goal of the subgroup name (see SUBGROUPS).'''
+    if name == 'corners':
+        return (corner_perm_move_table(), _twist_move_table()), 0
+    if name == 'edge_orientation':
+        return (_flip_move_table(),), 0
+    if name == 'twist_flip':
+        return (_twist_move_table(), _flip_move_table()), 0
+    if name == 'slice_flip':
+        return (_slice_move_table(), _flip_move_table()), SLICE_SOLVED * N_FLIP
+    raise ValueError('Unknown subgroup: %s' % name)
+
+# The subgroups known by subgroup(), and their sizes.
+SUBGROUPS = {'corners': 40320 * N_TWIST, 'edge_orientation': N_FLIP, 'twist_flip': N_TWIST * N_FLIP, 'slice_flip': N_SLICE * N_FLIP}
+
+def neighbours(tables, states):
+    '''Return the (N_MOVES, len(states)) array of the neighbours of the states.'''
+    coords = []
+    for table in tables[::-1]:
+        states, c = np.divmod(states, len(table))
+        coords.append(c)
+    result = np.zeros((N_MOVES, len(coords[0])), dtype=np.int64)
+    for table, c in zip(tables, coords[::-1]):
+        result *= len(table)
+        result += table[c].T
+    return result
+
+def _frontier(store, lo, code):
+    '''Return the states of store (a part of the whole store starting at byte lo) having the given code.'''
+    states = []
+    for s in range(4):
+        states.append(4*(lo + np.flatnonzero(((store >> (2*s)) & 3) == code)) + s)
+    return np.concatenate(states)
+
+def _unvisited(store, states):
+    return (store[states >> 2] >> (2*(states & 3))) & 3 == UNVISITED
+
+def expand(tables, store, lo, hi, code):
+    '''Return the unvisited neighbours (without repetitions) of the states with the given code in the bytes lo - hi of the store.'''
+    frontier = _frontier(store[lo:hi], lo, code)
+    if len(frontier) == 0:
+        return frontier
+    new = neighbours(tables, frontier).reshape(-1)
+    return np.unique(new[_unvisited(store, new)])
+
+def mark(store, states, code):
+    '''Set the code of the unvisited states among states (without repetitions). Return the number of states set.'''
+    states = states[_unvisited(store, states)]
+    for s in range(4):
+        part = states[(states & 3) == s] >> 2
+        store[part] ^= np.uint8((UNVISITED ^ code) << (2*s))
+    return len(states)
+
+_worker = {}
+
+def _init_worker(tables, path, n_bytes):
+    _worker['tables'] = tables
+    _worker['store'] = np.memmap(path, dtype=np.uint8, mode='r', shape=(n_bytes,))
+
+def _expand_in_worker(lo, hi, code):
+    return expand(_worker['tables'], _worker['store'], lo, hi, code)
+
+def _save_json(path, data):
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w') as f: json.dump(data, f)
+    os.replace(tmp_path, path)
+
+def bfs(name, path, processes=1, max_depth=None, log=None):
+    '''Explore the subgroup name (see SUBGROUPS) breadth-first, with the store in path (resuming from it if it exists).
+    Return the checkpoint: a dict with the histogram (number of states at each distance) and whether the search is complete.'''
+    tables, goal = subgroup(name)
+    size = 1
+    for table in tables: size *= len(table)
+    n_bytes = -(-size // 4)
+    meta_path = path + '.json'
+    if os.path.exists(meta_path) and os.path.exists(path):
+        with open(meta_path) as f: checkpoint = json.load(f)
+        if checkpoint['subgroup'] != name or checkpoint['size'] != size:
+            raise ValueError('%s is a checkpoint of %s, not of %s' % (path, checkpoint['subgroup'], name))
+        store = np.memmap(path, dtype=np.uint8, mode='r+', shape=(n_bytes,))
+    else:
+        store = np.memmap(path, dtype=np.uint8, mode='w+', shape=(n_bytes,))
+        store[:] = 0xFF
+        mark(store, np.array([goal]), 0)
+        store.flush()
+        checkpoint = {'subgroup': name, 'size': size, 'histogram': [1], 'complete': False, 'seconds': 0.0}
+        _save_json(meta_path, checkpoint)
+
+    executor = None
+    if processes > 1:
+        executor = ProcessPoolExecutor(processes, initializer=_init_worker, initargs=(tables, path, n_bytes))
+    try:
+        while not checkpoint['complete'] and (max_depth is None or len(checkpoint['histogram']) <= max_depth):
+            start = time.perf_counter()
+            depth = len(checkpoint['histogram']) - 1
+            ranges = [(lo, min(n_bytes, lo + CHUNK_BYTES)) for lo in range(0, n_bytes, CHUNK_BYTES)]
+            if executor is None:
+                results = (expand(tables, store, lo, hi, depth % 3) for lo, hi in ranges)
+            else:
+                results = executor.map(_expand_in_worker, *zip(*ranges), [depth % 3]*len(ranges))
+            for new in results:
+                mark(store, new, (depth + 1) % 3)
+            store.flush()
+            visited = int(np.bincount(store, minlength=256) @ VISITED_IN_BYTE)
+            count = visited - sum(checkpoint['histogram'])
+            if count == 0:
+                checkpoint['complete'] = True
+            else:
+                checkpoint['histogram'].append(count)
+            checkpoint['seconds'] += time.perf_counter() - start
+            _save_json(meta_path, checkpoint)
+            if log is not None:
+                log('depth %d: %d states (%.1f s)' % (depth + 1, count, time.perf_counter() - start))
+    finally:
+        if executor is not None: executor.shutdown()
+    return checkpoint
+
+
+
+############################################################
+##  The last layer after STEP 3.
+############################################################
+# The last layer configurations are not a subgroup, so instead of a search all of them are solved with STEP 4 - STEP 7 of rubik.py,
+# giving the distribution of the length of the rest of the solution (in face turns) after STEP 3.
+
+def last_layer_states():
+    '''Yield the 62208 states with the White and middle layers solved (all the real cubes which can follow STEP 3).'''
+    Y_c = [rubik.corners.index(c) for c in rubik.Y_corners]
+    Y_e = [rubik.edges.index(e) for e in rubik.Y_edges]
+    for cp_Y in permutations(Y_c):
+        for ep_Y in permutations(Y_e):
+            # The pieces of the Yellow layer are permuted among themselves, so the parities are those of the permutations of the indices in Y_c and Y_e.
+            if rubik.parity([Y_c.index(c) for c in cp_Y]) != rubik.parity([Y_e.index(e) for e in ep_Y]): continue
+            for co_Y in product(range(3), repeat=3):
+                for eo_Y in product(range(2), repeat=3):
+                    cp, co = list(range(8)), [0]*8
+                    ep, eo = list(range(12)), [0]*12
+                    for i, c in enumerate(Y_c):
+                        cp[c] = cp_Y[i]
+                        co[c] = (co_Y + (-sum(co_Y) % 3,))[i]
+                    for i, e in enumerate(Y_e):
+                        ep[e] = ep_Y[i]
+                        eo[e] = (eo_Y + (sum(eo_Y) % 2,))[i]
+                    yield CubieCube(cp, co, ep, eo).to_dict()
+
+def last_layer_length(state):
+    '''Return the number of face turns STEP 4 - STEP 7 take on the state.'''
+    state_of_cube = dict(state)
+    steps = []
+    for stage in rubik.STAGES[3:]:
+        for st, _ in stage(state_of_cube):
+            steps.extend(st)
+    return face_turns(steps)
+
+def _last_layer_lengths(states):
+    return [last_layer_length(s) for s in states]
+
+def last_layer_histogram(processes=1, chunk_size=1024):
+    '''Return the histogram of the number of face turns of STEP 4 - STEP 7 over all the last layer configurations.'''
+    states = list(last_layer_states())
+    chunks = [states[i:i+chunk_size] for i in range(0, len(states), chunk_size)]
+    if processes > 1:
+        with ProcessPoolExecutor(processes) as executor:
+            lengths = [n for part in executor.map(_last_layer_lengths, chunks) for n in part]
+    else:
+        lengths = [n for part in map(_last_layer_lengths, chunks) for n in part]
+    return np.bincount(lengths).tolist()
+
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Distribution of distances in subgroups of the cube.')
+    parser.add_argument('subgroup', choices=sorted(SUBGROUPS) + ['last_layer'])
+    parser.add_argument('--path', help='file of the store and the checkpoint (default: SUBGROUP.bfs)')
+    parser.add_argument('--processes', type=int, default=1)
+    parser.add_argument('--max-depth', type=int, help='stop after this depth (the search can be continued later)')
+    args = parser.parse_args()
+
+    if args.subgroup == 'last_layer':
+        histogram = last_layer_histogram(args.processes)
+        print(json.dumps({'subgroup': 'last_layer', 'size': sum(histogram), 'histogram': histogram}))
+        return
+    checkpoint = bfs(args.subgroup, args.path or args.subgroup + '.bfs', args.processes, args.max_depth, log=print)
+    print(json.dumps(checkpoint))
+
+
+if __name__ == '__main__':
+    main()
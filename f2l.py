@@ -0,0 +1,247 @@
+import heapq
+
+import numpy as np
+
+import rubik
+from rubik import corners, edges, W_corners, W_edges, key_form, shift_power
+from cubie import CubieCube, MOVE_CUBES, N_MOVES, moves_to_steps
+from simplify import face_turns
+
+############################################################
+##  Search-based first two layers.
+############################################################
+# The stages below can replace STEP 1 - STEP 3 of rubik.py (see STAGES):
+#   solve_cross - the White edges with the fewest possible moves. The distance of every placement of the 4 White edges from the solved
+#                 cross is computed by a breadth-first search (190080 placements), then the cross is solved by always making
+#                 a move which decreases the distance, so the result is optimal.
+#   solve_pairs - the White corners together with the middle edges, as 4 pairs (a slot is a White corner with the middle edge next to it).
+#                 A pair is solved with the turns of the Yellow side and triggers X Y^k X^-1 (X a side next to the slot). A trigger moves only
+#                 the Yellow layer and one slot, so it keeps the cross and the other slots. The pair-insertion table gives the shortest
+#                 way (in face turns) from each placement of the pair (576) to its slot, for each slot and for each set of slots whose
+#                 triggers can be used (the ones not solved yet). At each turn the pair which is the closest to its slot is solved.
+
+######### The cross. #########
+
+def _edge_moves():
+    '''Return the (N_MOVES, 24) table of where each move takes a single edge, given as 2*position + orientation.'''
+    table = np.empty((N_MOVES, 24), dtype=np.int64)
+    for m, mc in enumerate(MOVE_CUBES):
+        for i in range(12):
+            for o in range(2):
+                table[m, 2*mc.ep[i] + o] = 2*i + (o + mc.eo[i]) % 2
+    return table
+
+EDGE_MOVES = _edge_moves()
+
+N_CROSS = 24**4
+
+def cross_coord(state_of_cube):
+    '''Return the placement of the White edges: the (position, orientation) of each of them in base 24.'''
+    places = [None]*4
+    for i, e in enumerate(edges):
+        val = state_of_cube[e]
+        piece = key_form(val)
+        if piece in W_edges:
+            places[W_edges.index(piece)] = 2*i + (piece != val)
+    coord = 0
+    for place in places: coord = 24*coord + place
+    return coord
+
+def cross_move(coord, move):
+    '''Return the placement of the White edges after move.'''
+    new = 0
+    for j in range(4):
+        new = 24*new + int(EDGE_MOVES[move, (coord // 24**(3-j)) % 24])
+    return new
+
+def _cross_table():
+    '''Breadth-first search from the solved cross, return the array of the distances (255 for the impossible coordinates).'''
+    table = np.full(N_CROSS, 255, dtype=np.uint8)
+    table[cross_coord(rubik.solved_cube())] = 0
+    depth = 0
+    while True:
+        frontier = np.flatnonzero(table == depth)
+        if len(frontier) == 0: break
+        digits = [(frontier // 24**(3-j)) % 24 for j in range(4)]
+        for m in range(N_MOVES):
+            new = np.zeros(len(frontier), dtype=np.int64)
+            for d in digits: new = 24*new + EDGE_MOVES[m, d]
+            new = new[table[new] == 255]
+            table[new] = depth + 1
+        depth += 1
+    return table
+
+_cross_distances = None
+
+def cross_distances():
+    global _cross_distances
+    if _cross_distances is None:
+        _cross_distances = _cross_table()
+    return _cross_distances
+
+def cross_moves(state_of_cube):
+    '''Return an optimal sequence of moves (move numbers of cubie.py) solving the White edges.'''
+    table = cross_distances()
+    coord = cross_coord(state_of_cube)
+    moves = []
+    while table[coord] > 0:
+        for m in range(N_MOVES):
+            new = cross_move(coord, m)
+            if table[new] < table[coord]:
+                break
+        moves.append(m)
+        coord = new
+    return moves
+
+def solve_cross(state_of_cube):
+    '''STEP 1 by search: solving the White edges with the fewest moves. Yields (steps, None) once (if anything has to be done).'''
+    steps = moves_to_steps(cross_moves(state_of_cube))
+    if steps:
+        rubik.cw_rot(state_of_cube, steps)
+        yield steps, None
+
+
+
+######### The pairs. #########
+
+# Slot i is W_corners[i] with the middle edge between its two non-White sides.
+SLOT_EDGES = tuple(key_form(c[1:]) for c in W_corners)
+
+def _trigger_slot(steps):
+    '''Return the slot moved by a trigger, checking that it keeps the cross and the other slots.'''
+    cc = CubieCube()
+    cc.cw_rot(steps)
+    moved = [i for i in range(4) if cc.cp[i] != i or cc.co[i] or cc.ep[edges.index(SLOT_EDGES[i])] != edges.index(SLOT_EDGES[i])]
+    if len(moved) != 1 or any(cc.ep[i] != i or cc.eo[i] for i in range(4)):
+        raise ValueError('Not a trigger: %s' % rubik.compact_notation(steps))
+    return moved[0]
+
+def _pair_macros():
+    '''Return the macros of the pair-insertion: a list of (steps, slot moved by it or None for the Yellow turns).'''
+    macros = [((6,)*k, None) for k in range(1, 4)]
+    for side_no in (2, 3, 4, 5):
+        for a in (1, 3):
+            for k in range(1, 4):
+                steps = (side_no,)*a + (6,)*k + (side_no,)*(4-a)
+                macros.append((steps, _trigger_slot(steps)))
+    return macros
+
+PAIR_MACROS = _pair_macros()
+
+def _place_maps(steps):
+    '''Return where the steps take a corner and an edge, as lists indexed by (position, orientation) (3*pos+ori and 2*pos+ori).'''
+    cc = CubieCube()
+    cc.cw_rot(steps)
+    corner_map, edge_map = [None]*24, [None]*24
+    for i in range(8):
+        for o in range(3): corner_map[3*cc.cp[i] + o] = 3*i + (o + cc.co[i]) % 3
+    for i in range(12):
+        for o in range(2): edge_map[2*cc.ep[i] + o] = 2*i + (o + cc.eo[i]) % 2
+    return corner_map, edge_map
+
+PAIR_MACRO_MAPS = [_place_maps(steps) for steps, _ in PAIR_MACROS]
+
+def pair_coord(state_of_cube, slot):
+    '''Return the placement of the pieces of slot: 24*(3*corner position + twist) + 2*edge position + flip.'''
+    corner, edge = W_corners[slot], SLOT_EDGES[slot]
+    for i, c in enumerate(corners):
+        val = state_of_cube[c]
+        if key_form(val) == corner:
+            corner_place = 3*i + shift_power(corner, val)
+    for i, e in enumerate(edges):
+        val = state_of_cube[e]
+        if key_form(val) == edge:
+            edge_place = 2*i + (edge != val)
+    return 24*corner_place + edge_place
+
+def _pair_table(slot, allowed):
+    '''Dijkstra search from the solved pair of slot using the Yellow turns and the triggers of the slots in allowed.
+    Return a dict placement -> (distance in face turns, index of the first macro, placement after it).'''
+    macros = [j for j, (_, s) in enumerate(PAIR_MACROS) if s is None or s in allowed]
+    goal = 24*(3*slot) + 2*edges.index(SLOT_EDGES[slot])
+    # The placements from which a macro leads to each placement.
+    sources = {}
+    for c in range(24):
+        for e in range(24):
+            for j in macros:
+                corner_map, edge_map = PAIR_MACRO_MAPS[j]
+                sources.setdefault(24*corner_map[c] + edge_map[e], []).append((j, 24*c + e))
+    table = {goal: (0, None, None)}
+    heap = [(0, goal)]
+    while heap:
+        d, p = heapq.heappop(heap)
+        if d > table[p][0]: continue
+        for j, q in sources.get(p, ()):
+            nd = d + face_turns(PAIR_MACROS[j][0])
+            if q not in table or nd < table[q][0]:
+                table[q] = (nd, j, p)
+                heapq.heappush(heap, (nd, q))
+    return table
+
+_pair_tables = {}
+
+def pair_table(slot, solved):
+    '''Return the pair-insertion table of slot when the slots in solved are already solved.'''
+    allowed = frozenset(range(4)) - frozenset(solved)
+    if (slot, allowed) not in _pair_tables:
+        _pair_tables[(slot, allowed)] = _pair_table(slot, allowed)
+    return _pair_tables[(slot, allowed)]
+
+def build_pair_tables():
+    '''Compute the pair-insertion tables of every slot for every set of solved slots (32 tables), so that solve_pairs doesn't have to.'''
+    for slot in range(4):
+        others = [s for s in range(4) if s != slot]
+        for k in range(8):
+            pair_table(slot, [others[i] for i in range(3) if k >> i & 1])
+
+def slot_solved(state_of_cube, slot):
+    return state_of_cube[W_corners[slot]] == W_corners[slot] and state_of_cube[SLOT_EDGES[slot]] == SLOT_EDGES[slot]
+
+def solve_pairs(state_of_cube):
+    '''STEP 2 and STEP 3 by search: solving the White corners and the middle edges in pairs, the closest pair first.
+    Yields (steps, the White corner of the slot). It's assumed that the White edges are solved.'''
+    while True:
+        solved = [slot for slot in range(4) if slot_solved(state_of_cube, slot)]
+        if len(solved) == 4: break
+        best = None
+        for slot in range(4):
+            if slot in solved: continue
+            coord = pair_coord(state_of_cube, slot)
+            entry = pair_table(slot, solved).get(coord)
+            if entry is None:
+                raise ValueError('Wrong cube configuration!')
+            if best is None or entry[0] < best[0]:
+                best = (entry[0], slot, coord)
+        _, slot, coord = best
+        table = pair_table(slot, solved)
+        steps = []
+        while table[coord][1] is not None:
+            _, j, coord = table[coord]
+            steps.extend(PAIR_MACROS[j][0])
+        steps = tuple(steps)
+        rubik.cw_rot(state_of_cube, steps)
+        yield steps, W_corners[slot]
+
+
+
+############################################################
+##  Solving with the search stages.
+############################################################
+
+# The search stages in place of STEP 1 - STEP 3, followed by STEP 4 - STEP 7 of rubik.py
+# (they can be combined with other stages the same way, e.g. with lastlayer.solve_last_layer).
+STAGES = (solve_cross, solve_pairs) + rubik.STAGES[3:]
+
+def solve_stages(state):
+    '''Return the steps of the cross, the pairs and STEP 4 - STEP 7 as a tuple of 6 tuples. The state dict is not modified.'''
+    return rubik.solve_stages(state, STAGES)
+
+def solve(state):
+    '''Return the steps solving the cube as a tuple, with the search stages in place of STEP 1 - STEP 3.'''
+    return rubik.solve(state, STAGES)
+
+def savings(state):
+    '''Return the number of face turns of the first two layers with STEP 1 - STEP 3 and with the search stages, and the difference, as a dict.'''
+    greedy = sum(face_turns(steps) for steps in rubik.solve_stages(state)[:3])
+    search = sum(face_turns(steps) for steps in rubik.solve_stages(state, STAGES[:2]))
+    return {'greedy': greedy, 'search': search, 'saved': greedy - search}
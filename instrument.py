@@ -0,0 +1,157 @@
+import functools
+import heapq
+import json
+import time
+from contextlib import contextmanager
+
+import rubik
+
+############################################################
+##  Instrumentation of the solver.
+############################################################
+# enable() replaces the stages, the helper functions and cw_1_rot in rubik.py by wrappers which report to a Profiler,
+# and disable() puts the original functions back. So when the instrumentation is disabled, the solver runs exactly the original code.
+# The Profiler collects
+#   - per stage: number of loop iterations (yields), CW-rotations, cw_1_rot calls, the cases taken, wall time and a timing histogram,
+#   - per helper: number of calls, CW-rotations, wall time and a timing histogram,
+#   - per solve: number of solves, and the slowest solves together with their states.
+# The histograms count durations in buckets of powers of 2 microseconds: bucket i holds the durations in [2^(i-1), 2^i) us (bucket 0: < 1 us).
+# The counters are not protected by locks, use one profiler per thread (or just one thread).
+
+HELPERS = ('W_corner_put_in_place', 'mid_edge_put_in_place', 'cyclic_3_Y_edge_commutator', 'Y_edge_flip_commutator',
+           'cyclic_3_Y_corner_commutator', 'cw_acw_Y_corner_commutator')
+N_BUCKETS = 32
+
+def _case_of_stage(no, info):
+    '''Return the name of the case taken by an iteration of a stage, from the info yielded by it.'''
+    if no == 1:
+        return 'case_%d' % info
+    if no == 3:
+        return 'yellow_edge_moved_to_middle' if 6 in info else 'middle_edge_put_in_place'
+    if no == 4:
+        return 'auxiliary_rotation' if info is None else 'commutator'
+    return 'commutator'
+
+def _new_record():
+    return {'calls': 0, 'moves': 0, 'cw_1_rot': 0, 'seconds': 0.0, 'histogram': [0]*N_BUCKETS}
+
+
+class Profiler:
+    '''Counters and timing histograms of the stages and helpers of the solver.'''
+
+    def __init__(self, worst=10):
+        self.stages = {no: dict(_new_record(), cases={}) for no in range(1, len(rubik.STAGES)+1)}
+        self.helpers = {name: _new_record() for name in HELPERS}
+        self.solves = _new_record()
+        self.worst_count = worst
+        self._worst = []
+        self._stage = None
+
+    def _observe(self, record, seconds):
+        record['seconds'] += seconds
+        record['histogram'][min(N_BUCKETS - 1, int(seconds * 1e6).bit_length())] += 1
+
+    def report(self):
+        '''Return everything collected as a dict (which can be serialized as JSON).'''
+        return {'stages': {str(no): rec for no, rec in self.stages.items()},
+                'helpers': self.helpers,
+                'solves': self.solves,
+                'worst_solves': [{'seconds': s, 'moves': m, 'state': st} for s, _, m, st in sorted(self._worst, reverse=True)]}
+
+    def to_json(self, **kwargs):
+        return json.dumps(self.report(), **kwargs)
+
+    ######### The wrappers. #########
+
+    def _wrap_cw_1_rot(self, cw_1_rot):
+        @functools.wraps(cw_1_rot)
+        def wrapped(state_of_cube, side_no):
+            if self._stage is not None:
+                self.stages[self._stage]['cw_1_rot'] += 1
+            self.solves['cw_1_rot'] += 1
+            cw_1_rot(state_of_cube, side_no)
+        return wrapped
+
+    def _wrap_helper(self, name, helper):
+        record = self.helpers[name]
+        @functools.wraps(helper)
+        def wrapped(state_of_cube, *args, **kwargs):
+            start = time.perf_counter()
+            steps = helper(state_of_cube, *args, **kwargs)
+            self._observe(record, time.perf_counter() - start)
+            record['calls'] += 1
+            record['moves'] += len(steps)
+            return steps
+        return wrapped
+
+    def _wrap_stage(self, no, stage):
+        record = self.stages[no]
+        @functools.wraps(stage)
+        def wrapped(state_of_cube):
+            record['calls'] += 1
+            outer_stage, self._stage = self._stage, no
+            start = time.perf_counter()
+            try:
+                for steps, info in stage(state_of_cube):
+                    record['moves'] += len(steps)
+                    case = _case_of_stage(no, info)
+                    record['cases'][case] = record['cases'].get(case, 0) + 1
+                    yield steps, info
+            finally:
+                self._stage = outer_stage
+                self._observe(record, time.perf_counter() - start)
+        return wrapped
+
+    def _wrap_solve_stages(self, solve_stages):
+        @functools.wraps(solve_stages)
+        def wrapped(state, *args, **kwargs):
+            start = time.perf_counter()
+            stage_steps = solve_stages(state, *args, **kwargs)
+            seconds = time.perf_counter() - start
+            self._observe(self.solves, seconds)
+            self.solves['calls'] += 1
+            moves = sum(len(steps) for steps in stage_steps)
+            self.solves['moves'] += moves
+            if self.worst_count > 0:
+                item = (seconds, self.solves['calls'], moves, repr(state))
+                if len(self._worst) < self.worst_count:
+                    heapq.heappush(self._worst, item)
+                elif seconds > self._worst[0][0]:
+                    heapq.heapreplace(self._worst, item)
+            return stage_steps
+        return wrapped
+
+
+_originals = None
+
+def enable(profiler=None):
+    '''Start reporting to profiler (a new Profiler by default), and return it.'''
+    global _originals
+    if _originals is not None:
+        disable()
+    profiler = Profiler() if profiler is None else profiler
+    names = ('cw_1_rot', 'STAGES', 'solve_stages') + HELPERS
+    _originals = {name: getattr(rubik, name) for name in names}
+    rubik.cw_1_rot = profiler._wrap_cw_1_rot(_originals['cw_1_rot'])
+    for name in HELPERS:
+        setattr(rubik, name, profiler._wrap_helper(name, _originals[name]))
+    rubik.STAGES = tuple(profiler._wrap_stage(no, stage) for no, stage in enumerate(_originals['STAGES'], start=1))
+    rubik.solve_stages = profiler._wrap_solve_stages(_originals['solve_stages'])
+    return profiler
+
+def disable():
+    '''Put the original functions back.'''
+    global _originals
+    if _originals is None: return
+    for name, function in _originals.items():
+        setattr(rubik, name, function)
+    _originals = None
+
+@contextmanager
+def profiling(profiler=None):
+    '''Context manager version of enable/disable, giving the profiler.'''
+    profiler = enable(profiler)
+    try:
+        yield profiler
+    finally:
+        disable()
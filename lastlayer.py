@@ -0,0 +1,199 @@
+import os
+
+import numpy as np
+
+import rubik
+from rubik import corners, edges, find_orient, cw_sides
+from batch import MOD, from_dicts
+from cubie import CubieCube, steps_to_moves, moves_to_steps
+from simplify import simplify, face_turns
+from solutioncache import SYMMETRIES, image_steps
+from tablecache import cached_tables
+from explore import last_layer_states
+
+############################################################
+##  One-look last layer.
+############################################################
+# After STEP 3 only the Yellow layer is unsolved, and it is in one of 62208 configurations. The table gives for each of them
+# a short sequence of steps solving it, so the last layer is finished with one lookup instead of the loops of STEP 4 - STEP 7.
+#
+# The table is computed offline by a search: the macros are known last layer algorithms (OLL and PLL cases) and the commutators
+# of STEP 4 - STEP 7, in all their forms (rotated about the White-Yellow axis, mirrored, inverted), and the turns of the Yellow side
+# (so the Yellow side is adjusted before, after and between the algorithms as needed).
+# A Dijkstra search from the solved cube over the 62208 configurations, with the macros weighted by their number of face turns,
+# finds the shortest combination of macros for each configuration. All the configurations are processed at once with NumPy.
+# The solutions are near-optimal: they are optimal combinations of the macros, not optimal move sequences.
+
+# The algorithms in the usual notation, held with Yellow up. Each one leaves the White and middle layers solved.
+ALGORITHMS = (
+    "F R U R' U' F'",                               # OLL 45
+    "R U R' U R U2 R'",                             # OLL 27 (Sune)
+    "R U2 R' U' R U' R'",                           # OLL 26 (Anti-Sune)
+    "R U R' U' R' F R F'",                          # OLL 33
+    "R' F R B' R' F' R B",                          # OLL 42 part
+    "R U2 R2 U' R2 U' R2 U2 R",                     # OLL 22 (Pi)
+    "F R U R' U' R U R' U' F'",                     # OLL 21 part
+    "R2 D R' U2 R D' R' U2 R'",                     # OLL 23 (Headlights)
+    "R U R' U' R' F R2 U' R' U' R U R' F'",         # T-perm
+    "R U' R U R U R U' R' U' R2",                   # Ua-perm
+    "R2 U R U R' U' R' U' R' U R'",                 # Ub-perm
+    "R U R' F' R U R' U' R' F R2 U' R'",            # Jb-perm
+    "F R U' R' U' R U R' F' R U R' U' R' F R F'",   # Y-perm
+    "R' F R' B2 R F' R' B2 R2",                     # Aa-perm
+    "R2 U2 R U2 R2 U2 R2 U2 R U2 R2",               # H-perm
+)
+
+def algorithm_steps(orient_to_num, algorithm):
+    '''Return the steps (CW-rotations) of an algorithm in the usual notation (e.g. "R U2 R'") in the orientation orient_to_num.'''
+    steps = []
+    for word in algorithm.split():
+        power = {'': 1, '2': 2, "'": 3}.get(word[1:])
+        if power is None or word[0] not in orient_to_num:
+            raise ValueError('Invalid move: ' + word)
+        steps.extend([orient_to_num[word[0]]]*power)
+    return tuple(steps)
+
+def inverse_steps(steps):
+    '''Return the steps undoing steps.'''
+    return tuple(s for s in reversed(steps) for i in range(3))
+
+def last_layer_solved(cc):
+    '''Return True if the White and the middle layers of the CubieCube are solved.'''
+    return all(cc.cp[i] == i and cc.co[i] == 0 for i in range(4)) and all(cc.ep[i] == i and cc.eo[i] == 0 for i in range(8))
+
+def macros():
+    '''Return the macros of the search as a list of steps without repetitions.'''
+    base = [algorithm_steps(find_orient(U_no=6, F_no=cw_sides(6)[0]), a) for a in ALGORITHMS]
+    Y_c, Y_e = rubik.Y_corners, rubik.Y_edges
+    base.append(rubik.CYCLIC_3_Y_EDGE_STEPS[(Y_e[0], Y_e[1], Y_e[2])])
+    base.append(rubik.Y_EDGE_FLIP_STEPS[(Y_e[0], Y_e[1])])
+    base.append(rubik.CYCLIC_3_Y_CORNER_STEPS[(Y_c[0], Y_c[1], Y_c[2])])
+    base.append(rubik.CW_ACW_Y_CORNER_STEPS[(Y_c[0], Y_c[1])])
+    # The symmetries keeping the White and Yellow sides in place.
+    sym_nos = [n for n, (sym, _) in enumerate(SYMMETRIES) if sym[1] == 1 and sym[6] == 6]
+    result = {(6,), (6,6), (6,6,6)}
+    for steps in base:
+        cc = CubieCube()
+        cc.cw_rot(steps)
+        if not last_layer_solved(cc):
+            raise ValueError('Not a last layer algorithm: ' + rubik.compact_notation(steps))
+        for n in sym_nos:
+            for s in (steps, inverse_steps(steps)):
+                result.add(simplify(image_steps(s, n)))
+    return sorted(result)
+
+def _ll_keys(perm, ori):
+    '''Return the key of each last layer configuration (perm, ori as in batch.py): the pieces and orientations at the Yellow positions in base 24.'''
+    perm, ori = perm.astype(np.int64), ori.astype(np.int64)
+    key = np.zeros(len(perm), dtype=np.int64)
+    for i in range(4, 8):
+        key = 24*key + 3*perm[:, i] + ori[:, i]
+    for i in range(16, 20):
+        key = 24*key + 2*(perm[:, i] - 8) + ori[:, i]
+    return key
+
+def build_table():
+    '''Compute the table: the sorted keys of the configurations and the moves (cubie.py move numbers, padded with 255) solving them.'''
+    perm, ori = from_dicts(list(last_layer_states()))
+    keys = _ll_keys(perm, ori)
+    order = np.argsort(keys)
+    keys, perm, ori = keys[order], perm[order], ori[order]
+    n = len(keys)
+    ms = macros()
+    weights = [face_turns(m) for m in ms]
+    # For the backward search a configuration s is reached from t by a macro m if t = s * m, i.e. s = t * inverse(m).
+    transforms = []
+    for m in ms:
+        cc = CubieCube()
+        cc.cw_rot(inverse_steps(m))
+        transforms.append((np.array(list(cc.cp) + [e + 8 for e in cc.ep]), np.array(list(cc.co) + list(cc.eo), dtype=np.int8)))
+    dist = np.full(n, np.iinfo(np.int32).max, dtype=np.int64)
+    macro = np.full(n, -1, dtype=np.int32)
+    nxt = np.full(n, -1, dtype=np.int32)
+    solved = np.searchsorted(keys, last_layer_key(rubik.solved_cube()))
+    dist[solved] = 0
+    d = 0
+    while d <= dist[dist < np.iinfo(np.int32).max].max():
+        frontier = np.flatnonzero(dist == d)
+        for j, (src, delta) in enumerate(transforms):
+            if len(frontier) == 0: break
+            p = perm[frontier][:, src]
+            o = (ori[frontier][:, src] + delta) % MOD
+            s = np.searchsorted(keys, _ll_keys(p, o))
+            better = dist[s] > d + weights[j]
+            s, t = s[better], frontier[better]
+            # The same s may occur more times, any of them is good.
+            dist[s] = d + weights[j]
+            macro[s] = j
+            nxt[s] = t
+        d += 1
+    if (macro[np.arange(n) != solved] < 0).any():
+        raise ValueError('Some last layer configurations are not reached by the macros')
+    solutions = []
+    for s in range(n):
+        steps = []
+        while s != solved:
+            steps.extend(ms[macro[s]])
+            s = nxt[s]
+        solutions.append(steps_to_moves(simplify(steps)))
+    moves = np.full((n, max(len(m) for m in solutions)), 255, dtype=np.uint8)
+    for i, m in enumerate(solutions):
+        moves[i, :len(m)] = m
+    return {'keys': keys, 'moves': moves}
+
+# The table is stored in TABLE_PATH (or in the file given by the RUBIK_LL_TABLES environment variable) after it is computed the first time.
+# TABLE_KEY has to be changed whenever build_table or the macros change.
+TABLE_KEY = ('lastlayer', 1)
+TABLE_PATH = os.environ.get('RUBIK_LL_TABLES', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'lastlayer_tables.bin'))
+
+_table = None
+
+def get_table(path=None):
+    '''Return the table as a dict key -> steps. At the first call it is loaded from path (TABLE_PATH by default), or computed and saved there.'''
+    global _table
+    if _table is None:
+        arrays = cached_tables(TABLE_PATH if path is None else path, TABLE_KEY, build_table)
+        _table = {int(k): moves_to_steps(m[m != 255].tolist()) for k, m in zip(arrays['keys'], arrays['moves'])}
+    return _table
+
+def last_layer_key(state_of_cube):
+    '''Return the key of the last layer configuration of a cube with solved White and middle layers.'''
+    key = 0
+    for i in range(4, 8):
+        val = state_of_cube[corners[i]]
+        piece = rubik.key_form(val)
+        key = 24*key + 3*corners.index(piece) + rubik.shift_power(piece, val)
+    for i in range(8, 12):
+        val = state_of_cube[edges[i]]
+        piece = rubik.key_form(val)
+        key = 24*key + 2*edges.index(piece) + (piece != val)
+    return key
+
+
+
+############################################################
+##  Solving with the table.
+############################################################
+
+def solve_last_layer(state_of_cube):
+    '''STEP 4 - STEP 7 in one look: solving the Yellow layer with the steps from the table. Yields (steps, the key of the configuration).
+    It's assumed that the White and middle layers are solved.'''
+    key = last_layer_key(state_of_cube)
+    try:
+        steps = get_table()[key]
+    except KeyError:
+        raise ValueError('Wrong cube configuration!')
+    if steps:
+        rubik.cw_rot(state_of_cube, steps)
+        yield steps, key
+
+# STEP 1 - STEP 3 of rubik.py followed by the one-look last layer.
+STAGES = rubik.STAGES[:3] + (solve_last_layer,)
+
+def solve_stages(state):
+    '''Return the steps of STEP 1 - STEP 3 and of the last layer as a tuple of 4 tuples. The state dict is not modified.'''
+    return rubik.solve_stages(state, STAGES)
+
+def solve(state):
+    '''Return the steps solving the cube as a tuple, finishing the last layer with the table.'''
+    return rubik.solve(state, STAGES)
@@ -0,0 +1,163 @@
+import multiprocessing
+import os
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+
+import rubik
+import f2l
+import lastlayer
+import twophase
+from simplify import simplify, face_turns
+from solutioncache import SYMMETRIES, INVERSES, image_record, image_steps
+from cubeio import unpack_cube
+
+############################################################
+##  Racing solvers against each other.
+############################################################
+# A configuration is a pipeline (a name in PIPELINES) together with a whole-cube orientation (the number of a rotation in SYMMETRIES
+# of solutioncache.py): the cube is turned to that orientation, solved by the pipeline, and the solution is turned back.
+# Turning the cube changes which pieces the stages pick (which White edge is solved first, the pivots of STEP 4 and STEP 6, ...),
+# so the lengths of the solutions of the same cube vary a lot between orientations.
+#
+# Portfolio.solve runs all the configurations on a pool of processes and returns the shortest solution (in face turns) found before
+# the deadline. The configurations of a pipeline are sent to the workers in chunks; a chunk stops at the deadline,
+# and the chunks not started by then are cancelled. The first configuration which is not twophase is always finished (even after the deadline),
+# so there is a solution even if the deadline is too short for the rest. The workers load their tables when the Portfolio is created,
+# so the deadlines of the first cubes are not spent on it. Portfolio.wins counts which configurations won, to help tuning the portfolio.
+
+def _f2l_lastlayer(state):
+    return rubik.solve(state, f2l.STAGES[:2] + lastlayer.STAGES[3:])
+
+def _twophase(state, deadline):
+    return twophase.solve(state, time_budget=max(0.0, deadline - time.time()))
+
+# The pipelines, each solving a my_cube-like dict. twophase is given the time left until the deadline.
+PIPELINES = {
+    'beginner': rubik.solve,
+    'lastlayer': lastlayer.solve,
+    'f2l': f2l.solve,
+    'f2l_lastlayer': _f2l_lastlayer,
+    'twophase': _twophase,
+}
+ROTATIONS = tuple(n for n, (_, rotation) in enumerate(SYMMETRIES) if rotation)
+DEFAULT_PIPELINES = ('beginner', 'lastlayer', 'f2l', 'f2l_lastlayer')
+
+def warm_up(with_twophase=False):
+    '''Load the tables of the pipelines (called once in each worker), the ones of twophase only if with_twophase is True.'''
+    if with_twophase:
+        twophase.get_tables()
+    lastlayer.get_table()
+    f2l.cross_distances()
+    f2l.build_pair_tables()
+
+_worker = {}
+
+def _init_worker(barrier, with_twophase):
+    warm_up(with_twophase)
+    _worker['barrier'] = barrier
+
+def _wait_for_workers():
+    # Returns when as many of these tasks are running as there are workers, i.e. when every worker has started and warmed up.
+    _worker['barrier'].wait()
+
+def solve_configurations(pipeline, sym_nos, state, deadline, first=False):
+    '''Solve the cube with pipeline in each orientation of sym_nos, until the deadline (time.time()); if first is True,
+    the first orientation is solved even after the deadline. Return a list of (face turns, pipeline, sym_no, steps) of the solutions found.'''
+    results = []
+    for sym_no in sym_nos:
+        if time.time() >= deadline and not (first and not results): break
+        image = unpack_cube(image_record(state, sym_no))
+        if pipeline == 'twophase':
+            steps = _twophase(image, deadline)
+            if steps is None: continue
+        else:
+            steps = PIPELINES[pipeline](image)
+        steps = simplify(image_steps(steps, INVERSES[sym_no]))
+        results.append((face_turns(steps), pipeline, sym_no, steps))
+    return results
+
+
+class Portfolio:
+    '''Solves each cube with many configurations at once and keeps the shortest solution. Use it as a context manager, or call close().
+    configurations is a list of (pipeline, list of sym_nos), by default every pipeline of DEFAULT_PIPELINES in every orientation.'''
+
+    def __init__(self, configurations=None, processes=None, chunk_size=6, executor=None):
+        if configurations is None:
+            configurations = [(p, ROTATIONS) for p in DEFAULT_PIPELINES]
+        for pipeline, _ in configurations:
+            if pipeline not in PIPELINES:
+                raise ValueError('Unknown pipeline: %s' % pipeline)
+        self.configurations = configurations
+        self.chunk_size = chunk_size
+        self._own_executor = executor is None
+        if executor is None:
+            self.processes = processes or os.cpu_count() or 1
+            with_twophase = any(pipeline == 'twophase' for pipeline, _ in configurations)
+            context = multiprocessing.get_context()
+            barrier = context.Barrier(self.processes)
+            self._executor = ProcessPoolExecutor(self.processes, mp_context=context, initializer=_init_worker, initargs=(barrier, with_twophase))
+            # A worker takes tasks only after its initializer is finished, and each of these tasks blocks until all of them are running,
+            # so they return when every worker has warmed up.
+            for f in [self._executor.submit(_wait_for_workers) for i in range(self.processes)]:
+                f.result()
+        else:
+            # The caller is responsible for warming up the workers of the executor (e.g. with initializer=warm_up).
+            self._executor = executor
+        self.wins = Counter()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def close(self):
+        if self._own_executor:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+
+    def solve(self, state, deadline=1.0):
+        '''Race the configurations on the cube for at most deadline seconds (plus the time of the chunks running at the deadline).
+        Return a dict with the shortest solution (steps), its face turns, the winning configuration (pipeline and sym_no),
+        the number of the configurations solved and of the chunks cancelled, and the time taken.
+        Raise TimeoutError if nothing was solved (only possible if every configuration is twophase).'''
+        rubik.check_cube(state)
+        end = time.time() + deadline
+        chunks = []
+        for pipeline, sym_nos in self.configurations:
+            size = 1 if pipeline == 'twophase' else self.chunk_size
+            for i in range(0, len(sym_nos), size):
+                chunks.append((pipeline, tuple(sym_nos[i:i+size])))
+        # The first chunk of a pipeline other than twophase (which may find nothing in time) is finished in any case, and it is sent first.
+        first = next((i for i, (pipeline, _) in enumerate(chunks) if pipeline != 'twophase'), None)
+        if first is not None:
+            chunks.insert(0, chunks.pop(first))
+        futures = [self._executor.submit(solve_configurations, pipeline, sym_nos, state, end, first is not None and i == 0)
+                   for i, (pipeline, sym_nos) in enumerate(chunks)]
+        results = []
+        pending = set(futures)
+        while pending:
+            done, pending = wait(pending, timeout=max(0.0, end - time.time()), return_when=FIRST_COMPLETED)
+            for f in done:
+                results.extend(f.result())
+            if time.time() >= end:
+                break
+        cancelled = sum(1 for f in pending if f.cancel())
+        # The chunks already running stop at the deadline by themselves (the first one after its first configuration), their results are taken too.
+        for f in pending:
+            if not f.cancelled():
+                results.extend(f.result())
+        if not results:
+            raise TimeoutError('No solution was found in %.3f s' % deadline)
+        turns, pipeline, sym_no, steps = min(results, key=lambda r: (r[0], r[1], r[2]))
+        self.wins[(pipeline, sym_no)] += 1
+        return {'steps': steps, 'face_turns': turns, 'pipeline': pipeline, 'sym_no': sym_no,
+                'solved': len(results), 'cancelled_chunks': cancelled,
+                'seconds': time.time() - (end - deadline)}
+
+    def report(self):
+        '''Return the number of wins of each pipeline and of each configuration, the most frequent first.'''
+        pipelines = Counter()
+        for (pipeline, _), n in self.wins.items(): pipelines[pipeline] += n
+        return {'pipelines': dict(pipelines.most_common()),
+                'configurations': [{'pipeline': p, 'sym_no': s, 'wins': n} for (p, s), n in self.wins.most_common()]}
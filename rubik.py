@@ -1,4 +1,6 @@
 import random
+from itertools import permutations
+from operator import itemgetter
 
 ############################################################
 ##  Setting up keys for the state of the mixed cube dict
@@ -17,7 +19,7 @@ W_edges = edges[:4]
 mid_edges = edges[4:8]
 Y_edges = edges[-4:]
 # In general an (a,b):(x,y) key-value pair in the dictionary means that the edge piece with colors x, y is at the place where the edge piece with colors a,b should be, and more preciesly color x/y is where a/b should be. The meaning is similar for corner pieces.
-# In this current version, the solution only works if the my_cube dict represents a real mixed cube (it won't detect if the configuration is not possible).
+# The solution only works if the my_cube dict represents a real mixed cube, this can be checked with check_cube.
 
 
 
@@ -26,30 +28,22 @@ Y_edges = edges[-4:]
 ############################################################
 # CW - clockwise
 # ACW - anti-clockwise
+# These facts are static, so they are computed once here, and the functions below only look them up.
+
+# The adjacent sides of each side in CW order (for 4, 5, 6 it's the reverse of the opposite side's).
+CW_SIDES = { 1:(2,4,5,3), 2:(1,3,6,4), 3:(1,5,6,2) }
+CW_SIDES.update({7-s: sides[::-1] for s, sides in list(CW_SIDES.items())})
+
+# Every ordering of the colors of a piece -> the key of the piece.
+KEY_FORMS = {perm: piece for piece in corners+edges for perm in permutations(piece)}
 
 def cw_sides(side_no):
     '''Return the labels of the adjacent sides to side_no in CW order as a tuple.'''
-    case_123 = ( (2,4,5,3), (1,3,6,4), (1,5,6,2) )
-    if side_no in [1,2,3]: return case_123[side_no - 1]
-    elif side_no in [4,5,6]: return tuple(list(cw_sides(7-side_no))[::-1])
-    else: return None
+    return CW_SIDES.get(side_no)
 
 def key_form(tup):
     '''Given a tuple of length 2 or 3, return its key form in my_cube dict.'''
-    if len(tup) == 2:
-        if edges.count(tup) > 0: return tup
-        elif edges.count((tup[1],tup[0])) > 0: return (tup[1],tup[0])
-        else: return None
-    elif len(tup) == 3:
-        if tup.count(1) == 1: lead = 1
-        elif tup.count(6) == 1: lead = 6
-        else: return None
-        lead_ind = tup.index(lead)
-        tup = (tup[lead_ind],tup[(lead_ind+1)%3],tup[(lead_ind+2)%3])
-        if corners.count(tup) > 0: return tup
-        elif corners.count((tup[0],tup[2],tup[1])) > 0: return (tup[0],tup[2],tup[1])
-        else: return None
-    else: return None
+    return KEY_FORMS.get(tup)
 
 def shift(tup,power=1):
     '''Shift the coordinates of a tuple (to the right) in a cyclic manner.'''
@@ -70,19 +64,27 @@ def shift_power(tup,shifted_tup):
 ##  Functions which make clockwise rotations.
 ############################################################
 
-def cw_1_rot(state_of_cube,side_no):
-    '''Make one CW-rotation on side side_no.'''
-    # Collecting the dict-keys whose values will be changed, the values of those keys, and the indices of side_no in each key and value.
+def cw_1_rot_moves(side_no):
+    '''Return the pieces moved by one CW-rotation on side side_no, as (from key, to key, shift as an itemgetter) triples.'''
+    # Collecting the dict-keys whose values will be changed, and the indices of side_no in each key.
     # We need the latter so that each piece is correctly placed in the dictionary.
     edge_keys = [ key_form( (side_no, cw_sides(side_no)[i]) ) for i in range(4) ]
     edge_key_side_no_inds = [k.index(side_no) for k in edge_keys]
     corner_keys = [ key_form( (side_no, cw_sides(side_no)[i], cw_sides(side_no)[(i+1)%4]) ) for i in range(4) ]
     corner_key_side_no_inds = [k.index(side_no) for k in corner_keys]
-    edge_vals = [state_of_cube[k] for k in edge_keys]
-    corner_vals = [state_of_cube[k] for k in corner_keys]
-    for i in range(4):
-        state_of_cube[edge_keys[(i+1)%4]] = shift(edge_vals[i],edge_key_side_no_inds[(i+1)%4]-edge_key_side_no_inds[i])
-        state_of_cube[corner_keys[(i+1)%4]] = shift(corner_vals[i],corner_key_side_no_inds[(i+1)%4]-corner_key_side_no_inds[i])
+    moves = []
+    for keys, inds in ((edge_keys, edge_key_side_no_inds), (corner_keys, corner_key_side_no_inds)):
+        for i in range(4):
+            shifted = shift(range(len(keys[i])), inds[(i+1)%4]-inds[i])
+            moves.append( (keys[i], keys[(i+1)%4], itemgetter(*shifted)) )
+    return tuple(moves)
+
+CW_1_ROT_MOVES = {side_no: cw_1_rot_moves(side_no) for side_no in range(1,7)}
+
+def cw_1_rot(state_of_cube,side_no):
+    '''Make one CW-rotation on side side_no.'''
+    # All the new values are computed before any of them is set.
+    state_of_cube.update([(to_key, shifted(state_of_cube[from_key])) for from_key, to_key, shifted in CW_1_ROT_MOVES[side_no]])
 
 def cw_rot(state_of_cube,side_nos):
     '''Make one or more CW-rotation, side_nos can be a list or tuple.'''
@@ -99,7 +101,7 @@ def in_place(state_of_cube,pieces):
     result = True
     for piece in pieces:
         piece = key_form(piece)
-        if set(piece) != set(state_of_cube[piece]):
+        if piece != key_form(state_of_cube[piece]):
             result = False
             break
     return result
@@ -114,7 +116,83 @@ def in_place_strictly(state_of_cube,pieces):
             break
     return result
 
-def find_orient(U_no,F_no):
+def not_in_place(state_of_cube,pieces):
+    '''Return the list of the pieces from pieces (keys) which are not where they should be.'''
+    return [piece for piece in pieces if piece != key_form(state_of_cube[piece])]
+
+def not_in_place_strictly(state_of_cube,pieces):
+    '''Return the list of the pieces from pieces (keys) which are not where they should be, or are flipped/rotated.'''
+    return [piece for piece in pieces if piece != state_of_cube[piece]]
+
+# The bit of each piece in the masks of PieceTracker, and the pieces moved by a CW-rotation of each side.
+PIECE_BITS = {piece: 1 << i for i, piece in enumerate(corners+edges)}
+BIT_PIECES = {bit: piece for piece, bit in PIECE_BITS.items()}
+ALL_PIECES_MASK = (1 << len(PIECE_BITS)) - 1
+CW_1_ROT_MASKS = {side_no: sum(PIECE_BITS[to_key] for _, to_key, _ in moves) for side_no, moves in CW_1_ROT_MOVES.items()}
+
+def pieces_mask(pieces):
+    '''Return the bits of the pieces (keys) or'ed together.'''
+    mask = 0
+    for piece in pieces: mask |= PIECE_BITS[piece]
+    return mask
+
+W_EDGES_MASK, W_CORNERS_MASK, MID_EDGES_MASK = pieces_mask(W_edges), pieces_mask(W_corners), pieces_mask(mid_edges)
+Y_EDGES_MASK, Y_CORNERS_MASK = pieces_mask(Y_edges), pieces_mask(Y_corners)
+
+class PieceTracker:
+    '''Keeps track of the pieces of a state dict which are in their place strictly (the strict mask) and possibly flipped/rotated
+    (the loose mask), so the stages check a group of pieces with one mask comparison.
+    The masks are maintained incrementally: after steps are made on the dict, moved(steps) marks the pieces they touch as dirty
+    (the CW_1_ROT_MASKS of the sides, one or per side), and only the dirty pieces of a group are looked at again when the group is checked.
+    Marking whole sequences instead of updating the masks in cw_1_rot keeps the rotations, which take most of the time, as fast as before.'''
+    __slots__ = ('state_of_cube', 'strict', 'loose', 'dirty')
+
+    def __init__(self, state_of_cube):
+        self.state_of_cube = state_of_cube
+        self.strict = 0
+        self.loose = 0
+        self.dirty = ALL_PIECES_MASK
+
+    def moved(self, steps):
+        '''Mark the pieces touched by steps (made on the dict since the last call).'''
+        for side_no in set(steps): self.dirty |= CW_1_ROT_MASKS[side_no]
+
+    def _refresh(self, mask):
+        dirty = self.dirty & mask
+        if not dirty: return
+        self.dirty ^= dirty
+        state_of_cube = self.state_of_cube
+        strict, loose = self.strict & ~dirty, self.loose & ~dirty
+        while dirty:
+            bit = dirty & -dirty
+            dirty ^= bit
+            piece = BIT_PIECES[bit]
+            value = state_of_cube[piece]
+            if value == piece: strict |= bit
+            if KEY_FORMS[value] == piece: loose |= bit
+        self.strict, self.loose = strict, loose
+
+    def in_place(self, mask):
+        '''Return True if each piece in mask is where it should be, but possibly flipped/rotated.'''
+        self._refresh(mask)
+        return self.loose & mask == mask
+
+    def in_place_strictly(self, mask):
+        '''Return True if each piece in mask is where it should be and it's also correctly rotated.'''
+        self._refresh(mask)
+        return self.strict & mask == mask
+
+    def not_in_place(self, pieces):
+        '''Return the list of the pieces from pieces (keys) which are not where they should be.'''
+        self._refresh(pieces_mask(pieces))
+        return [piece for piece in pieces if not self.loose & PIECE_BITS[piece]]
+
+    def not_in_place_strictly(self, pieces):
+        '''Return the list of the pieces from pieces (keys) which are not where they should be, or are flipped/rotated.'''
+        self._refresh(pieces_mask(pieces))
+        return [piece for piece in pieces if not self.strict & PIECE_BITS[piece]]
+
+def orient(U_no,F_no):
     '''Given which side is U and F, it returns a dictionary with keys 'U', 'F', 'R', 'L', 'D', 'B' '''
     orient_to_num = {'U':U_no, 'F':F_no}
     ind_2 = cw_sides(U_no).index(F_no)
@@ -123,108 +201,78 @@ def find_orient(U_no,F_no):
         orient_to_num['DLB'[i]] = 7 - orient_to_num['URF'[i]]
     return orient_to_num
 
+ORIENTS = {(U_no, F_no): orient(U_no, F_no) for U_no in range(1,7) for F_no in CW_SIDES[U_no]}
+
+def find_orient(U_no,F_no):
+    '''Given which side is U and F, it returns a dictionary with keys 'U', 'F', 'R', 'L', 'D', 'B'
+    The dictionary is shared between the calls, so it must not be modified.'''
+    return ORIENTS[(U_no,F_no)]
+
+def orient_steps(orient_to_num,moves):
+    '''Return the steps given by a string of 'U', 'F', 'R', 'L', 'D', 'B' characters (spaces are ignored) in the orientation orient_to_num.'''
+    return tuple([orient_to_num[ori] for ori in moves if ori != ' '])
+
 
 
 ############################################################
 ##  Functions for the solution.
 ############################################################
+# The steps of each function below depend only on the pieces given as arguments (and for W_corner_put_in_place and mid_edge_put_in_place
+# on a few values of state_of_cube), so they are computed for every possible combination of them once, by the ..._steps functions,
+# and the functions only look them up and make the rotations.
 
-def cw_acw_Y_corner_commutator(state_of_cube,cw_rotated_corner,acw_rotated_corner):
-    '''Part of STEP 7. Make rotations on the cube and return the iplemented steps as a tuple.
-    The function rotates acw_rotated_corner (refers to key) in CW direction and cw_rotated_corner (key) in ACW direction.
-    At this stage it's assumed that each piece is already strictly in its place, except for
-    some yellow corners which are in their places, but possibly not strictly.
-    We perform the following commutator, where acw_rotated_corner is at the corner of (U,R,F), (note that U is automatically yellow),
-    and the power p depends on the repsective postions of cw_rotated_corner and acw_rotated_corner:
-    [R'][D][R][D'][R'][D][R] [Up] [R'][D'][R][D][R'][D'][R] [Up'].'''
+def cw_acw_Y_corner_commutator_steps(cw_rotated_corner,acw_rotated_corner):
+    '''Return the steps of cw_acw_Y_corner_commutator.'''
     orient_to_num = {'URF'[i]:acw_rotated_corner[i] for i in range(3)}
     orient_to_num['D'] = 1
     p = (cw_sides(6).index(acw_rotated_corner[2]) - cw_sides(6).index(cw_rotated_corner[2])) % 4
-    steps = tuple([orient_to_num[ori] for ori in list('RRRDRDDDRRRDR' + 'U'*p + 'RRRDDDRDRRRDDDR' + 'U'*(4-p))])
-    cw_rot( state_of_cube, steps )
-    return steps
+    return orient_steps(orient_to_num, 'RRRDRDDDRRRDR' + 'U'*p + 'RRRDDDRDRRRDDDR' + 'U'*(4-p))
 
-def cyclic_3_Y_corner_commutator(state_of_cube,Y_corner_0,Y_corner_1,Y_corner_2):
-    '''Part of STEP 6. Make rotations on the cube and return the iplemented steps as a tuple.
-    It's assumed that Y_corner_0 and Y_corner_2 are at opposite corners.
-    The function puts Y_corner_i into Y_corner_((i+1)%3)'s place (they refer to keys).
-    At this stage it's assumed that except for some yellow corners each piece is already strictly in its place.'''
+def cyclic_3_Y_corner_commutator_steps(Y_corner_0,Y_corner_1,Y_corner_2):
+    '''Return the steps of cyclic_3_Y_corner_commutator.'''
     if Y_corner_0[2] == Y_corner_1[1]: # If (Y_corner_0,Y_corner_1,Y_corner_2) is in a CW order on the Yellow side.
         orient_to_num = {'URF'[i]:Y_corner_1[i] for i in range(3)}
         for i in range(3):
             orient_to_num['DLB'[i]] = 7 - orient_to_num['URF'[i]]
-        steps = tuple([orient_to_num[ori] for ori in list('RRRLDRDDDLLL' + 'U' + 'LDRRRDDDLLLR' + 'UUU')])
+        return orient_steps(orient_to_num, 'RRRLDRDDDLLL' + 'U' + 'LDRRRDDDLLLR' + 'UUU')
     else: # If (Y_corner_0,Y_corner_1,Y_corner_2) is in an ACW order on the Yellow side.
         orient_to_num = {'URF'[i]:Y_corner_2[i] for i in range(3)}
         for i in range(3):
             orient_to_num['DLB'[i]] = 7 - orient_to_num['URF'[i]]
-        steps = tuple([orient_to_num[ori] for ori in list('RRRLDRDDDLLL' + 'UUU' + 'LDRRRDDDLLLR' + 'U')])
-    cw_rot( state_of_cube, steps )
-    return steps
+        return orient_steps(orient_to_num, 'RRRLDRDDDLLL' + 'UUU' + 'LDRRRDDDLLLR' + 'U')
 
-def Y_edge_flip_commutator(state_of_cube,Y_edge_0,Y_edge_1):
-    '''Part of STEP 5. Make rotations on the cube and return the iplemented steps as a tuple.
-    Flips Y_edge_0 and Y_edge_1 (refer to keys) without changing their places
-    At this stage it's assumed that the White and middle layers are solved, and Yellow edges are in their places, but not stritcly.'''
-    orient_to_num = {'U':6, 'F':Y_edge_0[0]}
+def Y_edge_flip_commutator_steps(Y_edge_0,Y_edge_1):
+    '''Return the steps of Y_edge_flip_commutator.'''
+    orient_to_num = find_orient(U_no=6, F_no=Y_edge_0[0])
     ind_0 = cw_sides(6).index(Y_edge_0[0])
-    orient_to_num['R'] = cw_sides(6)[(ind_0+3)%4]
-    for i in range(3):
-        orient_to_num['DLB'[i]] = 7 - orient_to_num['URF'[i]]
     ind_1 = cw_sides(6).index(Y_edge_1[0])
     p = (ind_0-ind_1)%4
-    steps = tuple([orient_to_num[ori] for ori in list('RLLLFLRRRDDDRLLLFFRRRL' + 'U'*p + 'LLLRFFLRRRDRLLLFFFLRRR' + 'U'*(4-p))])
-    cw_rot( state_of_cube, steps )
-    return steps
+    return orient_steps(orient_to_num, 'RLLLFLRRRDDDRLLLFFRRRL' + 'U'*p + 'LLLRFFLRRRDRLLLFFFLRRR' + 'U'*(4-p))
 
-def cyclic_3_Y_edge_commutator(state_of_cube,Y_edge_0,Y_edge_1,Y_edge_2):
-    '''Part of STEP 4. Make rotations on the cube and return the iplemented steps as a tuple.
-    Puts Y_edge_i into Y_edge_((i+1)%3)'s place (they refer to keys in the dict).
-    It's assumed that Y_edge_0 and Y_edge_2 are at opposite edges.
-    At this stage it's assumed that the White and middle layers are solved.'''
-    orient_to_num = {'U':6, 'F':Y_edge_2[0]}
+def cyclic_3_Y_edge_commutator_steps(Y_edge_0,Y_edge_1,Y_edge_2):
+    '''Return the steps of cyclic_3_Y_edge_commutator.'''
+    orient_to_num = find_orient(U_no=6, F_no=Y_edge_2[0])
     ind_2 = cw_sides(6).index(Y_edge_2[0])
-    orient_to_num['R'] = cw_sides(6)[(ind_2+3)%4]
-    for i in range(3):
-        orient_to_num['DLB'[i]] = 7 - orient_to_num['URF'[i]]
     ind_1 = cw_sides(6).index(Y_edge_1[0])
     p = (ind_2-ind_1)%4
     if p == 1:
-        steps = tuple([orient_to_num[ori] for ori in list('FRRRDDDFFFR' + 'U'*p + 'RRRFDRFFF' + 'U'*(4-p))])
+        return orient_steps(orient_to_num, 'FRRRDDDFFFR' + 'U'*p + 'RRRFDRFFF' + 'U'*(4-p))
     else: # p == 3
-        steps = tuple([orient_to_num[ori] for ori in list('LFFFDDDLLLF' + 'U'*p + 'FFFLDFLLL' + 'U'*(4-p))])
-    cw_rot( state_of_cube, steps )
-    return steps
+        return orient_steps(orient_to_num, 'LFFFDDDLLLF' + 'U'*p + 'FFFLDFLLL' + 'U'*(4-p))
 
-def mid_edge_put_in_place(state_of_cube,Y_edge):
-    '''Part of STEP 3. Make rotations on the cube and return the iplemented steps as a tuple.
-    If state_of_cube[Y_edge] is a middle edge, then put it into its place.
-    Otherwise, it puts it into an unsolved middle edge place.
-    At this stage it's assumed that the White layer is solved, BUT the middle isn't.'''
-    if set(state_of_cube[Y_edge]).issubset({2,3,4,5}): # If state_of_cube[Y_edge] is a middle edge.
-        matching_side, other_side = state_of_cube[Y_edge]
-    else: # If state_of_cube[Y_edge] is a yellow edge.
-        try:
-            matching_side, other_side = [m_e for m_e in mid_edges if state_of_cube[m_e] != m_e][0]
-        except:
-            print('Error!')
+def mid_edge_steps(Y_edge,matching_side,other_side):
+    '''Return the steps of mid_edge_put_in_place, when the middle edge (matching_side, other_side) is moved (from Y_edge).'''
     p0 = (cw_sides(6).index(matching_side) - cw_sides(6).index(Y_edge[0]))%4
     p1 = (cw_sides(6).index(matching_side) - cw_sides(6).index(other_side))%4
     p = (p0+p1)%4
     orient_to_num = find_orient(U_no=1, F_no=matching_side)
     if p1 == 1:
-        steps = tuple([orient_to_num[ori] for ori in list('D'*p + 'L DDD LLL DDD FFF D F'.replace(" ", ""))])
+        return orient_steps(orient_to_num, 'D'*p + 'L DDD LLL DDD FFF D F')
     else: # if p1 == 3
-        steps = tuple([orient_to_num[ori] for ori in list('D'*p + 'RRR D R D F DDD FFF'.replace(" ", ""))])
-    cw_rot( state_of_cube, steps )
-    return steps
+        return orient_steps(orient_to_num, 'D'*p + 'RRR D R D F DDD FFF')
 
-def W_corner_put_in_place(state_of_cube,Y_corner):
-    '''Part of STEP 2. Make rotations on the cube and return the iplemented steps as a tuple.
-    If state_of_cube[Y_corner] is a White corner, then put it into its place.
-    Otherwise, it's assumed that Y_corner is directly below an unsolved White corner place, and put Y_corner into that White corner place.
-    At this stage it's assumed that the White edges are already solved.'''
-    Y_corn_st = state_of_cube[Y_corner]
+def W_corner_steps(Y_corner,Y_corn_st):
+    '''Return the steps of W_corner_put_in_place, when Y_corn_st is at Y_corner.'''
     intersec = set(Y_corner).intersection(set(Y_corn_st))
     if Y_corn_st[0] == 1: # If Y_corn_st is a White corner, and White faces the Yellow side.
         if len(intersec) == 2: # Y_corner is in good placed
@@ -234,26 +282,419 @@ def W_corner_put_in_place(state_of_cube,Y_corner):
         elif Y_corner[2] == Y_corn_st[2]: p = 1
         else: p = 3
         orient_to_num = find_orient(U_no=1, F_no=Y_corn_st[2])
-        steps = tuple([orient_to_num[ori] for ori in list('D'*p + 'RRR D R F DD FFF'.replace(" ", ""))])
+        return orient_steps(orient_to_num, 'D'*p + 'RRR D R F DD FFF')
     elif Y_corn_st[1] == 1: # If Y_corn_st is a White corner, subcase 1.
         matching_side = Y_corn_st[2]
         diff_side = Y_corner[2]
         p = cw_sides(6).index(matching_side) - cw_sides(6).index(diff_side)
         orient_to_num = find_orient(U_no=1, F_no=matching_side)
-        steps = tuple([orient_to_num[ori] for ori in list('D'*((p-1)%4) + 'FFF D F'.replace(" ", ""))])
+        return orient_steps(orient_to_num, 'D'*((p-1)%4) + 'FFF D F')
     elif Y_corn_st[2] == 1: # If Y_corn_st is a White corner, subcase 2.
         matching_side = Y_corn_st[1]
         diff_side = Y_corner[1]
         p = cw_sides(6).index(matching_side) - cw_sides(6).index(diff_side)
         orient_to_num = find_orient(U_no=1, F_no=matching_side)
-        steps = tuple([orient_to_num[ori] for ori in list('D'*((p+1)%4) + 'F DDD FFF'.replace(" ", ""))])
+        return orient_steps(orient_to_num, 'D'*((p+1)%4) + 'F DDD FFF')
     else: # If Y_corn_st is not a White corner, hence a Yellow corner.
         # Note that in this case Y_corner is directly below an unsolved White corner place!
         orient_to_num = find_orient(U_no=1, F_no=Y_corner[1])
-        steps = tuple([orient_to_num[ori] for ori in list('D F DDD FFF'.replace(" ", ""))])
+        return orient_steps(orient_to_num, 'D F DDD FFF')
+
+CW_ACW_Y_CORNER_STEPS = {(c0,c1): cw_acw_Y_corner_commutator_steps(c0,c1) for c0, c1 in permutations(Y_corners, 2)}
+CYCLIC_3_Y_CORNER_STEPS = {cs: cyclic_3_Y_corner_commutator_steps(*cs) for cs in permutations(Y_corners, 3)}
+Y_EDGE_FLIP_STEPS = {(e0,e1): Y_edge_flip_commutator_steps(e0,e1) for e0, e1 in permutations(Y_edges, 2)}
+CYCLIC_3_Y_EDGE_STEPS = {es: cyclic_3_Y_edge_commutator_steps(*es) for es in permutations(Y_edges, 3)}
+MID_EDGE_STEPS = {(Y_e, m_e): mid_edge_steps(Y_e, *m_e) for Y_e in Y_edges for m_e in mid_edges + tuple(e[::-1] for e in mid_edges)}
+W_CORNER_STEPS = {(Y_c, val): W_corner_steps(Y_c, val) for Y_c in Y_corners for c in corners for val in (c, shift(c), shift(c,2))}
+
+def cw_acw_Y_corner_commutator(state_of_cube,cw_rotated_corner,acw_rotated_corner):
+    '''Part of STEP 7. Make rotations on the cube and return the iplemented steps as a tuple.
+    The function rotates acw_rotated_corner (refers to key) in CW direction and cw_rotated_corner (key) in ACW direction.
+    At this stage it's assumed that each piece is already strictly in its place, except for
+    some yellow corners which are in their places, but possibly not strictly.
+    We perform the following commutator, where acw_rotated_corner is at the corner of (U,R,F), (note that U is automatically yellow),
+    and the power p depends on the repsective postions of cw_rotated_corner and acw_rotated_corner:
+    [R'][D][R][D'][R'][D][R] [Up] [R'][D'][R][D][R'][D'][R] [Up'].'''
+    steps = CW_ACW_Y_CORNER_STEPS[(cw_rotated_corner,acw_rotated_corner)]
     cw_rot( state_of_cube, steps )
     return steps
 
+def cyclic_3_Y_corner_commutator(state_of_cube,Y_corner_0,Y_corner_1,Y_corner_2):
+    '''Part of STEP 6. Make rotations on the cube and return the iplemented steps as a tuple.
+    It's assumed that Y_corner_0 and Y_corner_2 are at opposite corners.
+    The function puts Y_corner_i into Y_corner_((i+1)%3)'s place (they refer to keys).
+    At this stage it's assumed that except for some yellow corners each piece is already strictly in its place.'''
+    steps = CYCLIC_3_Y_CORNER_STEPS[(Y_corner_0,Y_corner_1,Y_corner_2)]
+    cw_rot( state_of_cube, steps )
+    return steps
+
+def Y_edge_flip_commutator(state_of_cube,Y_edge_0,Y_edge_1):
+    '''Part of STEP 5. Make rotations on the cube and return the iplemented steps as a tuple.
+    Flips Y_edge_0 and Y_edge_1 (refer to keys) without changing their places
+    At this stage it's assumed that the White and middle layers are solved, and Yellow edges are in their places, but not stritcly.'''
+    steps = Y_EDGE_FLIP_STEPS[(Y_edge_0,Y_edge_1)]
+    cw_rot( state_of_cube, steps )
+    return steps
+
+def cyclic_3_Y_edge_commutator(state_of_cube,Y_edge_0,Y_edge_1,Y_edge_2):
+    '''Part of STEP 4. Make rotations on the cube and return the iplemented steps as a tuple.
+    Puts Y_edge_i into Y_edge_((i+1)%3)'s place (they refer to keys in the dict).
+    It's assumed that Y_edge_0 and Y_edge_2 are at opposite edges.
+    At this stage it's assumed that the White and middle layers are solved.'''
+    steps = CYCLIC_3_Y_EDGE_STEPS[(Y_edge_0,Y_edge_1,Y_edge_2)]
+    cw_rot( state_of_cube, steps )
+    return steps
+
+def mid_edge_put_in_place(state_of_cube,Y_edge):
+    '''Part of STEP 3. Make rotations on the cube and return the iplemented steps as a tuple.
+    If state_of_cube[Y_edge] is a middle edge, then put it into its place.
+    Otherwise, it puts it into an unsolved middle edge place.
+    At this stage it's assumed that the White layer is solved, BUT the middle isn't.'''
+    if 1 not in state_of_cube[Y_edge] and 6 not in state_of_cube[Y_edge]: # If state_of_cube[Y_edge] is a middle edge.
+        m_e = state_of_cube[Y_edge]
+    else: # If state_of_cube[Y_edge] is a yellow edge.
+        try:
+            m_e = not_in_place_strictly(state_of_cube,mid_edges)[0]
+        except IndexError:
+            raise ValueError('Wrong cube configuration!')
+    steps = MID_EDGE_STEPS[(Y_edge,m_e)]
+    cw_rot( state_of_cube, steps )
+    return steps
+
+def W_corner_put_in_place(state_of_cube,Y_corner):
+    '''Part of STEP 2. Make rotations on the cube and return the iplemented steps as a tuple.
+    If state_of_cube[Y_corner] is a White corner, then put it into its place.
+    Otherwise, it's assumed that Y_corner is directly below an unsolved White corner place, and put Y_corner into that White corner place.
+    At this stage it's assumed that the White edges are already solved.'''
+    steps = W_CORNER_STEPS[(Y_corner,state_of_cube[Y_corner])]
+    cw_rot( state_of_cube, steps )
+    return steps
+
+
+
+############################################################
+##  The stages of the solution.
+############################################################
+# Each stage is a generator which makes rotations on the cube, and after each group of rotations
+# it yields the implemented steps as a tuple together with some info about the moved pieces (used only for displaying).
+
+# The steps of case 2 and case 4 of STEP 1, by the non-White side of the edge place.
+W_EDGE_FLIP_STEPS = {side: orient_steps(find_orient(U_no=1, F_no=side), 'F UUU R U') for side in cw_sides(1)}
+Y_EDGE_FLIP_UP_STEPS = {side: orient_steps(find_orient(U_no=1, F_no=side), 'FFF RRR D R F') for side in cw_sides(6)}
+
+def solve_W_edges(state_of_cube):
+    '''STEP 1: solving white edges. Yields (steps, the number of the case which was applied, 1-5).'''
+    tracker = PieceTracker(state_of_cube)
+    while not tracker.in_place_strictly(W_EDGES_MASK):
+        W_ed_W_up = [W_e for W_e in W_edges if (state_of_cube[W_e][0] == 1 and state_of_cube[W_e] != W_e)]
+        if len(W_ed_W_up)>0:
+            W_e = W_ed_W_up[0]
+            W_e_st = state_of_cube[W_e]
+            non_W_side = W_e_st[1]
+            other_side = W_e[1]
+            p = ( cw_sides(1).index(other_side) - cw_sides(1).index(non_W_side) )%4
+            # Rotate W_e_st in place, without changing other pieces at W_edges
+            steps = tuple([other_side]+[1]*p+[other_side]*3+[1]*((4-p)%4))
+            cw_rot(state_of_cube, steps)
+            tracker.moved(steps)
+            yield steps, 1
+            continue
+
+        W_ed_W_side = [W_e for W_e in W_edges if state_of_cube[W_e][1] == 1]
+        if len(W_ed_W_side)>0:
+            W_e = W_ed_W_side[0]
+            other_side = W_e[1]
+            # Flips W_e, without changing other pieces at W_edges
+            steps = W_EDGE_FLIP_STEPS[other_side]
+            cw_rot(state_of_cube, steps)
+            tracker.moved(steps)
+            yield steps, 2
+            continue
+
+        Y_ed_W_down = [Y_e for Y_e in Y_edges if state_of_cube[Y_e][1] == 1]
+        if len(Y_ed_W_down)>0:
+            Y_e = Y_ed_W_down[0]
+            Y_e_st = state_of_cube[Y_e]
+            non_W_side = Y_e_st[0]
+            other_side = Y_e[0]
+            p = ( cw_sides(6).index(non_W_side) - cw_sides(6).index(other_side) )%4
+            steps = tuple([6]*p+[non_W_side]*2)
+            cw_rot(state_of_cube, steps)
+            tracker.moved(steps)
+            yield steps, 3
+            continue
+
+        Y_ed_W_side = [Y_e for Y_e in Y_edges if state_of_cube[Y_e][0] == 1]
+        if len(Y_ed_W_side)>0:
+            Y_e = Y_ed_W_side[0]
+            # Flips Y_e in its place, without changing other pieces at W_edges
+            steps = Y_EDGE_FLIP_UP_STEPS[Y_e[0]]
+            cw_rot(state_of_cube, steps)
+            tracker.moved(steps)
+            yield steps, 4
+            continue
+
+        mid_ed_W = [m_e for m_e in mid_edges if 1 in set(state_of_cube[m_e])]
+        if len(mid_ed_W) > 0:
+            mid_e = mid_ed_W[0]
+            s0, s1 = mid_e
+            if cw_sides(6)[ (cw_sides(6).index(s0)+1)%4 ] != s1:
+                s1, s0 = mid_e
+            steps = (s0,6,s0,s0,s0)
+            cw_rot(state_of_cube, steps)
+            tracker.moved(steps)
+            yield steps, 5
+            continue
+        else:
+            raise ValueError('Error, something went wrong!')
+
+def solve_W_corners(state_of_cube):
+    '''STEP 2: solving white corners. Yields (steps, the piece which was put to the White side).'''
+    tracker = PieceTracker(state_of_cube)
+    while not tracker.in_place_strictly(W_CORNERS_MASK):
+        Y_corner_contains_W = [Y_c for Y_c in Y_corners if 1 in set(state_of_cube[Y_c])]
+        if len(Y_corner_contains_W) > 0:
+            Y_c = Y_corner_contains_W[0]
+        else:
+            unsolved_W_corners = tracker.not_in_place_strictly(W_corners)
+            W_c = unsolved_W_corners[0]
+            Y_c = (6,W_c[2],W_c[1])
+        piece = state_of_cube[Y_c]
+        steps = W_corner_put_in_place(state_of_cube,Y_c)
+        tracker.moved(steps)
+        yield steps, piece
+
+def solve_mid_edges(state_of_cube):
+    '''STEP 3: solving edges in the middle layer. Yields (steps, the piece which was put in place of a middle edge).'''
+    # Something is not optimal here !!!!!!!!!!
+    tracker = PieceTracker(state_of_cube)
+    while not tracker.in_place_strictly(MID_EDGES_MASK):
+        mid_e_on_Y = [Y_e for Y_e in Y_edges if set(state_of_cube[Y_e]).issubset({2,3,4,5})]
+        if len(mid_e_on_Y) > 0:
+            Y_e = mid_e_on_Y[0]
+        else:
+            Y_e = Y_edges[0]
+        piece = state_of_cube[Y_e]
+        steps = mid_edge_put_in_place(state_of_cube,Y_e)
+        tracker.moved(steps)
+        yield steps, piece
+
+def place_Y_edges(state_of_cube):
+    '''STEP 4: putting yellow edges into their place (possibly not well-oriented).
+    Yields (steps, None) for the auxiliary rotations of the Yellow side, and (steps, the 3 cyclicly permuted pieces) otherwise.'''
+    tracker = PieceTracker(state_of_cube)
+    while not tracker.in_place(Y_EDGES_MASK):
+        for p in range(1,5):
+            cw_1_rot(state_of_cube, 6)
+            tracker.moved((6,))
+            Y_e_to_move = tracker.not_in_place(Y_edges)
+            if len(Y_e_to_move) >= 3:
+                break
+        p = p%4
+        if p > 0:
+            yield (6,)*p, None
+        Y_e_2 = None
+        for e in Y_e_to_move:
+            if 7 - e[0] in set(state_of_cube[e]):
+                Y_e_2 = e
+                break
+        if Y_e_2 == None: #In case we have two simple cycles !!!!! Should be done in a nicer way later on!!!!!
+            Y_e_2 = Y_e_to_move[0]
+        Y_e_to_move.remove(Y_e_2)
+        Y_e_0 = (7 - Y_e_2[0],6)
+        Y_e_to_move.remove(Y_e_0)
+        Y_e_1 = Y_e_to_move.pop()
+        pieces = (state_of_cube[Y_e_0], state_of_cube[Y_e_1], state_of_cube[Y_e_2])
+        steps = cyclic_3_Y_edge_commutator(state_of_cube,Y_e_0,Y_e_1,Y_e_2)
+        tracker.moved(steps)
+        yield steps, pieces
+
+def orient_Y_edges(state_of_cube):
+    '''STEP 5: orinenting the yellow edges. Yields (steps, the 2 flipped edges).'''
+    tracker = PieceTracker(state_of_cube)
+    while not tracker.in_place_strictly(Y_EDGES_MASK):
+        Y_e_to_flip = tracker.not_in_place_strictly(Y_edges)
+        Y_e_0 = Y_e_to_flip.pop()
+        Y_e_1 = Y_e_to_flip.pop()
+        steps = Y_edge_flip_commutator(state_of_cube,Y_e_0,Y_e_1)
+        tracker.moved(steps)
+        yield steps, (Y_e_0, Y_e_1)
+
+def place_Y_corners(state_of_cube):
+    '''STEP 6: putting yellow corners into their places (possibly not well-oriented). Yields (steps, the 3 cyclicly permuted pieces).'''
+    tracker = PieceTracker(state_of_cube)
+    while not tracker.in_place(Y_CORNERS_MASK):
+        Y_c_to_move = tracker.not_in_place(Y_corners)
+        for c in Y_c_to_move:
+            Y_c_2 = c
+            if len(set(state_of_cube[c]) | set(c)) == 5:
+                break
+        Y_c_0 = (Y_c_2[0],7-Y_c_2[1],7-Y_c_2[2]) # Opposite to Y_c_2
+        Y_c_to_move.remove(Y_c_0)
+        Y_c_to_move.remove(Y_c_2)
+        Y_c_1 = Y_c_to_move.pop()
+        pieces = (state_of_cube[Y_c_0], state_of_cube[Y_c_1], state_of_cube[Y_c_2])
+        steps = cyclic_3_Y_corner_commutator(state_of_cube,Y_c_0,Y_c_1,Y_c_2)
+        tracker.moved(steps)
+        yield steps, pieces
+
+def orient_Y_corners(state_of_cube):
+    '''STEP 7: orinenting yellow corners. Yields (steps, (the corner rotated CW, the corner rotated ACW)).'''
+    tracker = PieceTracker(state_of_cube)
+    while not tracker.in_place_strictly(Y_CORNERS_MASK):
+        #Collect the cw/acw rotated yellow corners
+        cw_rotated_corners = []
+        acw_rotated_corners = []
+        for c in Y_corners:
+            if shift_power(c,state_of_cube[c]) % 3 == 1: cw_rotated_corners.append(c)
+            elif shift_power(c,state_of_cube[c]) % 3 == 2: acw_rotated_corners.append(c)
+        # Pick the ones to be rotated
+        if len(cw_rotated_corners+acw_rotated_corners) == 1:
+            raise ValueError('Wrong cube configuration!')
+        elif len(cw_rotated_corners) == 0:
+            #if there are only acw rotated yellow corners, then we pick two, one will be rotated cw, the other acw.
+            cw = acw_rotated_corners.pop()
+            acw = acw_rotated_corners.pop()
+            cw_rotated_corners.append(cw)
+        elif len(acw_rotated_corners) == 0:
+            cw = cw_rotated_corners.pop()
+            acw = cw_rotated_corners.pop()
+            acw_rotated_corners.append(acw)
+        else:
+            cw = cw_rotated_corners.pop()
+            acw = acw_rotated_corners.pop()
+        steps = cw_acw_Y_corner_commutator(state_of_cube,cw,acw)
+        tracker.moved(steps)
+        yield steps, (acw, cw)
+
+STAGES = (solve_W_edges, solve_W_corners, solve_mid_edges, place_Y_edges, orient_Y_edges, place_Y_corners, orient_Y_corners)
+
+
+
+############################################################
+##  Checking if the state of the cube is a real mixed cube.
+############################################################
+
+class InvalidCubeError(ValueError):
+    '''Raised when the state of the cube can't be solved. reason is one of the keys of INVALID_REASONS, key is the key of the wrong piece (or None).'''
+    def __init__(self, reason, key=None):
+        self.reason = reason
+        self.key = key
+        message = INVALID_REASONS[reason] if key is None else INVALID_REASONS[reason] + ': ' + str(key)
+        super().__init__(message)
+
+    def __reduce__(self):
+        # Unpickling (e.g. when a worker process of service.py returns the error) calls the class with reason and key, not with the message.
+        return (InvalidCubeError, (self.reason, self.key))
+
+INVALID_REASONS = {
+    'keys': 'The keys are not the pieces of the cube',
+    'piece': 'Not a piece of the cube',
+    'duplicate': 'A piece occurs more than once',
+    'twist': 'The sum of the corner twists is not 0 (mod 3)',
+    'flip': 'The sum of the edge flips is not 0 (mod 2)',
+    'parity': 'The parities of the corner and edge permutations are different',
+}
+
+# Every possible value of a corner/edge key: value -> (index of the piece, orientation as shift_power(piece, value)).
+PIECE_VALUES = {shift(c,p): (i,p) for i, c in enumerate(corners) for p in range(3)}
+PIECE_VALUES.update({shift(e,p): (i,p) for i, e in enumerate(edges) for p in range(2)})
+
+def parity(perm):
+    '''Return the parity of a permutation given as a list (0 for even, 1 for odd).'''
+    seen = [False]*len(perm)
+    cycles = 0
+    for i in range(len(perm)):
+        if seen[i]: continue
+        cycles += 1
+        j = i
+        while not seen[j]:
+            seen[j] = True
+            j = perm[j]
+    return (len(perm) - cycles) % 2
+
+def check_cube(state_of_cube):
+    '''Return None if state_of_cube represents a real mixed cube, otherwise raise InvalidCubeError.
+    Each piece has to occur exactly once, the sum of the corner twists has to be 0 mod 3, the sum of the edge flips 0 mod 2,
+    and the permutations of the corners and of the edges have to be both even or both odd.'''
+    if len(state_of_cube) != 20:
+        raise InvalidCubeError('keys')
+    perms = []
+    for keys in (corners, edges):
+        perm = []
+        orient = 0
+        for k in keys:
+            try:
+                piece, p = PIECE_VALUES[state_of_cube[k]]
+            except KeyError:
+                raise InvalidCubeError('keys' if k not in state_of_cube else 'piece', k)
+            except TypeError:
+                raise InvalidCubeError('piece', k)
+            if len(state_of_cube[k]) != len(k):
+                raise InvalidCubeError('piece', k)
+            perm.append(piece)
+            orient += p
+        if len(set(perm)) != len(keys):
+            raise InvalidCubeError('duplicate')
+        if orient % len(keys[0]) != 0:
+            raise InvalidCubeError('twist' if keys is corners else 'flip')
+        perms.append(perm)
+    if parity(perms[0]) != parity(perms[1]):
+        raise InvalidCubeError('parity')
+
+def cube_errors(states):
+    '''Check the cubes of an iterable of states. Yield None for each real cube, and the InvalidCubeError for the others.'''
+    for state in states:
+        try:
+            check_cube(state)
+            yield None
+        except InvalidCubeError as e:
+            yield e
+
+
+
+############################################################
+##  Solving the cube without any I/O.
+############################################################
+
+def solved_cube():
+    '''Return the state dict of the solved cube.'''
+    return { item:item for item in corners+edges }
+
+def random_cube(number_of_steps=1000):
+    '''Return the state dict of a cube mixed by number_of_steps random CW-rotations.'''
+    steps = tuple(random.randint(1,6) for i in range(number_of_steps))
+    state_of_cube = solved_cube()
+    cw_rot(state_of_cube, steps)
+    return state_of_cube
+
+def solve_stages(state, stages=None):
+    '''Return the steps of STEP 1 - STEP 7 solving the cube as a tuple of 7 tuples. The state dict is not modified.
+    Other stages can be given as a sequence of stage generators (e.g. lastlayer.STAGES), then the tuple has a tuple for each of them.
+    Raise InvalidCubeError if the state is not a real mixed cube.'''
+    check_cube(state)
+    state_of_cube = dict(state)
+    stage_steps = []
+    for stage in (STAGES if stages is None else stages):
+        steps = []
+        for st, _ in stage(state_of_cube):
+            steps.extend(st)
+        stage_steps.append(tuple(steps))
+    return tuple(stage_steps)
+
+def solve(state, stages=None):
+    '''Return the steps solving the cube as a tuple. The state dict is not modified, and nothing is printed or asked.'''
+    steps = []
+    for st in solve_stages(state, stages):
+        steps.extend(st)
+    return tuple(steps)
+
+def solve_many(states):
+    '''Solve the cubes of an iterable of state dicts one by one, yielding the steps for each of them.
+    It is a generator, so arbitrarily long streams of states can be solved with constant memory.'''
+    for state in states:
+        yield solve(state)
+
 
 
 ############################################################
@@ -269,6 +710,30 @@ def num_piece_to_color(num_piece):
     for i in range(len(num_piece)): lst.append(num_to_color[num_piece[i]])
     return tuple(lst)
 
+def compact_notation(steps):
+    '''Return the steps in the compact notation of print_steps, like "W O2 G'".'''
+    words = []
+    i = 0
+    while i < len(steps):
+        p = 1
+        while i+p < len(steps) and steps[i+p] == steps[i]:
+            p += 1
+        if p%4 > 0:
+            words.append(num_to_color[steps[i]] + ['', '2', "'"][p%4 - 1])
+        i += p
+    return ' '.join(words)
+
+def parse_compact_notation(text):
+    '''Return the steps (CW-rotations) given in the compact notation of print_steps.'''
+    steps = []
+    for word in text.split():
+        side_no = color_to_num[word[0].upper()]
+        power = {'': 1, '2': 2, "'": 3}.get(word[1:])
+        if power is None:
+            raise ValueError('Invalid move: ' + word)
+        steps.extend([side_no]*power)
+    return tuple(steps)
+
 def print_steps(steps):
     '''Given a series of steps, it prints it nicely.'''
     if len(steps) > 0:
@@ -296,6 +761,8 @@ def print_state(my_cube):
     diff = [(num_piece_to_color(k),num_piece_to_color(v)) for k,v in my_cube.items() if k != v]
     for k,v in diff:
         print(' '*4,k, v)
+
+def pause():
     input('\n'+' '*4+'press Enter to continue.\n')
 
 
@@ -304,246 +771,132 @@ def print_state(my_cube):
 ##  Setting up the state of the cube as a dict.
 ############################################################
 
-randomly_mix = 's'
-
-while randomly_mix != 'r' and randomly_mix != 'm':
-    randomly_mix = input("Would you like me to randomly mix te cube, or you would prefer to give the state of your cube manually? Press 'R' for the former and 'M' for the latter:   ")
-    if len(randomly_mix)==0: randomly_mix = 's'
-    else: randomly_mix = randomly_mix[0].lower()
-
-    if randomly_mix == 'r':
-        steps = tuple(random.randint(1,6) for i in range(1000))
-        my_cube = { item:item for item in corners+edges }
-        cw_rot(my_cube, steps)
-    elif randomly_mix == 'm':
-        my_cube = dict()
-        print('\nPlease enter the current state of the cube below.\n')
-        for key in corners+edges:
-            if len(key) == 3: piece_type = ' corner '
-            elif len(key) == 2: piece_type = ' edge '
-            val = list()
-            for i in range(len(key)):
-                okay = False
-                while not okay:
-                    val_i = input(' '*4+'What color do you have at the ' + str(num_piece_to_color(key)) + piece_type + 'on the ' + str(num_piece_to_color(key)[i]) +' side:   ')
-                    try:
-                        val_i = val_i.upper()[0]
-                    except:
-                        continue
-                    okay = (val_i in color_to_num.keys())
-                    if not okay: print(' '*8+'Invalid value, please enter again!')
-                val.append(color_to_num[val_i])
-            my_cube[key] = tuple(val)
-            print('')
-
-print('\nThe state of the cube -- only showing unsolved pieces:\n')
-print_state(my_cube)
+def input_cube():
+    '''Ask the state of the cube piece by piece, and return it as a dict.'''
+    my_cube = dict()
+    print('\nPlease enter the current state of the cube below.\n')
+    for key in corners+edges:
+        if len(key) == 3: piece_type = ' corner '
+        elif len(key) == 2: piece_type = ' edge '
+        val = list()
+        for i in range(len(key)):
+            okay = False
+            while not okay:
+                val_i = input(' '*4+'What color do you have at the ' + str(num_piece_to_color(key)) + piece_type + 'on the ' + str(num_piece_to_color(key)[i]) +' side:   ')
+                try:
+                    val_i = val_i.upper()[0]
+                except:
+                    continue
+                okay = (val_i in color_to_num.keys())
+                if not okay: print(' '*8+'Invalid value, please enter again!')
+            val.append(color_to_num[val_i])
+        my_cube[key] = tuple(val)
+        print('')
+    return my_cube
+
+def get_cube():
+    '''Ask whether the cube should be mixed randomly or given manually, and return its state as a dict.'''
+    randomly_mix = 's'
+    while randomly_mix != 'r' and randomly_mix != 'm':
+        randomly_mix = input("Would you like me to randomly mix te cube, or you would prefer to give the state of your cube manually? Press 'R' for the former and 'M' for the latter:   ")
+        if len(randomly_mix)==0: randomly_mix = 's'
+        else: randomly_mix = randomly_mix[0].lower()
+
+        if randomly_mix == 'r':
+            my_cube = random_cube()
+        elif randomly_mix == 'm':
+            my_cube = input_cube()
+    return my_cube
 
 
 
 ############################################################
-##  The actual solving of the cube.
+##  The actual solving of the cube, step by step.
 ############################################################
 
-######### STEP 1: solving white edges. #########
-print('STEP 1: solving white edges.\n')
-
-while not in_place_strictly(my_cube,W_edges):
-    W_ed_W_up = [W_e for W_e in W_edges if (my_cube[W_e][0] == 1 and my_cube[W_e] != W_e)]
-    if len(W_ed_W_up)>0:
-        W_e = W_ed_W_up[0]
-        W_e_st = my_cube[W_e]
-        non_W_side = W_e_st[1]
-        other_side = W_e[1]
-        p = ( cw_sides(1).index(other_side) - cw_sides(1).index(non_W_side) )%4
-        # Rotate W_e_st in place, without changing other pieces at W_edges
-        steps = tuple([other_side]+[1]*p+[other_side]*3+[1]*((4-p)%4))
-        cw_rot(my_cube, steps)
-        print(' '*4+'Do the following steps:\n')
-        print_steps(steps)
-        continue
-
-    W_ed_W_side = [W_e for W_e in W_edges if my_cube[W_e][1] == 1]
-    if len(W_ed_W_side)>0:
-        W_e = W_ed_W_side[0]
-        W_e_st = my_cube[W_e]
-        non_W_side = W_e_st[1]
-        other_side = W_e[1]
-        # Flips W_e, without changing other pieces at W_edges
-        orient_to_num = find_orient(U_no=1, F_no=other_side)
-        steps = tuple([orient_to_num[ori] for ori in list('F UUU R U'.replace(" ", ""))])
-        cw_rot(my_cube, steps)
-        print(' '*4+'Do the following steps:\n')
-        print_steps(steps)
-        continue
-
-    Y_ed_W_down = [Y_e for Y_e in Y_edges if my_cube[Y_e][1] == 1]
-    if len(Y_ed_W_down)>0:
-        Y_e = Y_ed_W_down[0]
-        Y_e_st = my_cube[Y_e]
-        non_W_side = Y_e_st[0]
-        other_side = Y_e[0]
-        p = ( cw_sides(6).index(non_W_side) - cw_sides(6).index(other_side) )%4
-        steps = tuple([6]*p+[non_W_side]*2)
-        cw_rot(my_cube, steps)
-        print(' '*4+'Do the following steps:\n')
-        print_steps(steps)
-        continue
-
-    Y_ed_W_side = [Y_e for Y_e in Y_edges if my_cube[Y_e][0] == 1]
-    if len(Y_ed_W_side)>0:
-        Y_e = Y_ed_W_side[0]
-        orient_to_num = find_orient(U_no=1, F_no=Y_e[0])
-        # Flips Y_e in its place, without changing other pieces at W_edges
-        steps = tuple([orient_to_num[ori] for ori in list('FFF RRR D R F'.replace(" ", ""))])
-        cw_rot(my_cube, steps)
-        print(' '*4+'Do the following steps:\n')
-        print_steps(steps)
-        continue
-
-    mid_ed_W = [m_e for m_e in mid_edges if 1 in set(my_cube[m_e])]
-    if len(mid_ed_W) > 0:
-        mid_e = mid_ed_W[0]
-        s0, s1 = mid_e
-        if cw_sides(6)[ (cw_sides(6).index(s0)+1)%4 ] != s1:
-            s1, s0 = mid_e
-        steps = (s0,6,s0,s0,s0)
-        cw_rot(my_cube, steps)
-        print(' '*4+'Do the following steps:\n')
-        print_steps(steps)
-        continue
-    else:
-        print('Error, something went wrong!')
+def main():
+    my_cube = get_cube()
+    print('\nThe state of the cube -- only showing unsolved pieces:\n')
+    print_state(my_cube)
+    pause()
+    try:
+        check_cube(my_cube)
+    except InvalidCubeError as e:
+        print(' '*4+'Wrong cube configuration! ' + str(e))
+        return
+
+    try:
+        ######### STEP 1: solving white edges. #########
+        print('STEP 1: solving white edges.\n')
+        for steps, _ in solve_W_edges(my_cube):
+            print(' '*4+'Do the following steps:\n')
+            print_steps(steps)
+        print('\n'+' '*4+"Cube's state after STEP 1 (white edges solved) -- only showing unsolved pieces:\n")
+        print_state(my_cube)
+        pause()
+
+        ######### STEP 2: solving white corners. #########
+        print('STEP 2: solving white corners.\n')
+        for steps, piece in solve_W_corners(my_cube):
+            print(' '*4+'Do the following steps in order to put', num_piece_to_color(piece), 'to the White side:\n')
+            print_steps(steps)
+        print('\n'+' '*4+"Cube's state after STEP 2 (white corners solved) -- only showing unsolved pieces:\n")
+        print_state(my_cube)
+        pause()
+
+        ######### STEP 3: solving edges in the middle layer. #########
+        print('STEP 3: solving edges in the middle layer.\n')
+        for steps, piece in solve_mid_edges(my_cube):
+            print(' '*4+'Do the following steps in order to put', num_piece_to_color(piece), 'in place of a middle edge:\n')
+            print_steps(steps)
+        print('\n'+' '*4+"Cube's state after STEP 3 (middle edges solved) -- only showing unsolved pieces:\n")
+        print_state(my_cube)
+        pause()
+
+        ######### STEP 4: putting yellow edges into their place (possibly not well-oriented) #########
+        print('STEP 4: putting yellow edges into their place (possibly not well-oriented).\n')
+        for steps, pieces in place_Y_edges(my_cube):
+            if pieces == None:
+                print(' '*4+'Follow the below auxiliary instruction:\n')
+            else:
+                print(' '*4+'Do the following steps in order to cyclicly permute', tuple(num_piece_to_color(p) for p in pieces), ':\n')
+            print_steps(steps)
+        print('\n'+' '*4+"Cube's state after STEP 4 (yellow edges half-solved) -- only showing unsolved pieces:\n")
+        print_state(my_cube)
+        pause()
+
+        ######### STEP 5: orinenting the yellow edges #########
+        print('STEP 5: orinenting the yellow edges.\n')
+        for steps, (Y_e_0, Y_e_1) in orient_Y_edges(my_cube):
+            print(' '*4+'Do the following steps in order to flip', num_piece_to_color(Y_e_0), num_piece_to_color(Y_e_1), 'in their places:\n')
+            print_steps(steps)
+        print('\n'+' '*4+"Cube's state after STEP 5 (yellow edges completely solved) -- only showing unsolved pieces:\n")
+        print_state(my_cube)
+        pause()
+
+        ######### STEP 6: putting yellow corners into their places (possibly not well-oriented) #########
+        print('STEP 6: putting yellow corners into their places (possibly not well-oriented).\n')
+        for steps, pieces in place_Y_corners(my_cube):
+            print(' '*4+'Do the following steps in order to cyclicly permute', tuple(num_piece_to_color(p) for p in pieces), ':\n')
+            print_steps(steps)
+        print('\n'+' '*4+"Cube's state after STEP 6 (yellow corners half-solved) -- only showing unsolved pieces:\n")
+        print_state(my_cube)
+        pause()
+
+        ######### STEP 7: orinenting yellow corners #########
+        print('STEP 7: orinenting yellow corners.\n')
+        for steps, (acw, cw) in orient_Y_corners(my_cube):
+            print(' '*4+'Do the following steps in order to rotate the', num_piece_to_color(acw), 'corner clockwise, and the', num_piece_to_color(cw), 'corner anti-clockwise:\n')
+            print_steps(steps)
+    except ValueError as e:
+        print(e)
 
-print('\n'+' '*4+"Cube's state after STEP 1 (white edges solved) -- only showing unsolved pieces:\n")
-print_state(my_cube)
+    diff = [(num_piece_to_color(k),num_piece_to_color(v)) for k,v in my_cube.items() if k != v]
+    if len(diff) == 0:
+        print('\n'+' '*4+'The cube is solved :)\t\t\t')
+    else:
+        print('\n'+' '*4+'Something is WRONG :(:(:(:(:(:(:(:(:(:(:(:(:(')
 
 
-######### STEP 2: solving white corners. #########
-print('STEP 2: solving white corners.\n')
-while not in_place_strictly(my_cube,W_corners):
-    Y_corner_contains_W = [Y_c for Y_c in Y_corners if 1 in set(my_cube[Y_c])]
-    if len(Y_corner_contains_W) > 0:
-        Y_c = Y_corner_contains_W[0]
-    else:
-        unsolved_W_corners = [W_c for W_c in W_corners if my_cube[W_c] != W_c]
-        W_c = unsolved_W_corners[0]
-        Y_c = (6,W_c[2],W_c[1])
-    print(' '*4+'Do the following steps in order to put', num_piece_to_color(my_cube[Y_c]), 'to the White side:\n')
-    print_steps( W_corner_put_in_place(my_cube,Y_c) )
-
-print('\n'+' '*4+"Cube's state after STEP 2 (white corners solved) -- only showing unsolved pieces:\n")
-print_state(my_cube)
-
-
-######### STEP 3: solving edges in the middle layer. #########      Something is not optimal here !!!!!!!!!!
-print('STEP 3: solving edges in the middle layer.\n')
-while not in_place_strictly(my_cube,mid_edges):
-    mid_e_on_Y = [Y_e for Y_e in Y_edges if set(my_cube[Y_e]).issubset({2,3,4,5})]
-    ####mid_e_to_Y = [m_e for m_e in mid_edges if my_cube[m_e] != m_e]
-    if len(mid_e_on_Y) > 0:
-        Y_e = mid_e_on_Y[0]
-    else:
-        Y_e = Y_edges[0]
-    print(' '*4+'Do the following steps in order to put', num_piece_to_color(my_cube[Y_e]), 'in place of a middle edge:\n')
-    print_steps( mid_edge_put_in_place(my_cube,Y_e) )
-    
-print('\n'+' '*4+"Cube's state after STEP 3 (middle edges solved) -- only showing unsolved pieces:\n")
-print_state(my_cube)
-
-
-######### STEP 4: putting yellow edges into their place (possibly not well-oriented) #########
-print('STEP 4: putting yellow edges into their place (possibly not well-oriented).\n')
-while not in_place(my_cube,Y_edges):
-    for p in range(1,5):
-        cw_1_rot(my_cube, 6)
-        Y_e_to_move = [e for e in Y_edges if set(e) != set(my_cube[e])]
-        if len(Y_e_to_move) >= 3:
-            break
-    p = p%4
-    if p > 0:
-        print(' '*4+'Follow the below auxiliary instruction:\n')
-        print_steps([6]*p)
-    Y_e_2 = None
-    for e in Y_e_to_move:
-        if 7 - e[0] in set(my_cube[e]):
-            Y_e_2 = e
-            break
-    if Y_e_2 == None: #In case we have two simple cycles !!!!! Should be done in a nicer way later on!!!!!
-        Y_e_2 = Y_e_to_move[0]
-    Y_e_to_move.remove(Y_e_2)
-    Y_e_0 = (7 - Y_e_2[0],6)
-    Y_e_to_move.remove(Y_e_0)
-    Y_e_1 = Y_e_to_move.pop()
-    print(' '*4+'Do the following steps in order to cyclicly permute', ( num_piece_to_color(my_cube[Y_e_0]),num_piece_to_color(my_cube[Y_e_1]),num_piece_to_color(my_cube[Y_e_2]) ), ':\n')
-    print_steps( cyclic_3_Y_edge_commutator(my_cube,Y_e_0,Y_e_1,Y_e_2) )
-
-print('\n'+' '*4+"Cube's state after STEP 4 (yellow edges half-solved) -- only showing unsolved pieces:\n")
-print_state(my_cube)
-
-
-######### STEP 5: orinenting the yellow edges #########
-print('STEP 5: orinenting the yellow edges.\n')
-while not in_place_strictly(my_cube,Y_edges):
-    Y_e_to_flip = [e for e in Y_edges if e != my_cube[e]]
-    Y_e_0 = Y_e_to_flip.pop()
-    Y_e_1 = Y_e_to_flip.pop()
-    print(' '*4+'Do the following steps in order to flip', num_piece_to_color(Y_e_0), num_piece_to_color(Y_e_1), 'in their places:\n')
-    print_steps( Y_edge_flip_commutator(my_cube,Y_e_0,Y_e_1) )
-
-print('\n'+' '*4+"Cube's state after STEP 5 (yellow edges completely solved) -- only showing unsolved pieces:\n")
-print_state(my_cube)
-
-
-######### STEP 6: putting yellow corners into their places (possibly not well-oriented) #########
-print('STEP 6: putting yellow corners into their places (possibly not well-oriented).\n')
-while not in_place(my_cube,Y_corners):
-    Y_c_to_move = [c for c in Y_corners if set(c) != set(my_cube[c])]
-    for c in Y_c_to_move:
-        Y_c_2 = c
-        if len(set(my_cube[c]) | set(c)) == 5:
-            break
-    Y_c_0 = (Y_c_2[0],7-Y_c_2[1],7-Y_c_2[2]) # Opposite to Y_c_2
-    Y_c_to_move.remove(Y_c_0)
-    Y_c_to_move.remove(Y_c_2)
-    Y_c_1 = Y_c_to_move.pop()
-    print(' '*4+'Do the following steps in order to cyclicly permute', ( num_piece_to_color(my_cube[Y_c_0]),num_piece_to_color(my_cube[Y_c_1]),num_piece_to_color(my_cube[Y_c_2]) ), ':\n')
-    print_steps( cyclic_3_Y_corner_commutator(my_cube,Y_c_0,Y_c_1,Y_c_2) )
-
-print('\n'+' '*4+"Cube's state after STEP 6 (yellow corners half-solved) -- only showing unsolved pieces:\n")
-print_state(my_cube)
-
-
-######### STEP 7: orinenting yellow corners #########
-print('STEP 7: orinenting yellow corners.\n')
-while not in_place_strictly(my_cube,Y_corners):
-    #Collect the cw/acw rotated yellow corners
-    cw_rotated_corners = []
-    acw_rotated_corners = []
-    for c in Y_corners:
-        if shift_power(c,my_cube[c]) % 3 == 1: cw_rotated_corners.append(c)
-        elif shift_power(c,my_cube[c]) % 3 == 2: acw_rotated_corners.append(c)
-    # Pick the ones to be rotated
-    if len(cw_rotated_corners+acw_rotated_corners) == 1:
-        print('Wrong cube configuration!')
-        break
-    elif len(cw_rotated_corners) == 0:
-        #if there are only acw rotated yellow corners, then we pick two, one will be rotated cw, the other acw.
-        cw = acw_rotated_corners.pop()
-        acw = acw_rotated_corners.pop()
-        cw_rotated_corners.append(cw)
-    elif len(acw_rotated_corners) == 0:
-        cw = cw_rotated_corners.pop()
-        acw = cw_rotated_corners.pop()
-        acw_rotated_corners.append(acw)
-    else:
-        cw = cw_rotated_corners.pop()
-        acw = acw_rotated_corners.pop()
-    print(' '*4+'Do the following steps in order to rotate the', num_piece_to_color(acw), 'corner clockwise, and the', num_piece_to_color(cw), 'corner anti-clockwise:\n')
-    print_steps( cw_acw_Y_corner_commutator(my_cube,cw,acw) )
-
-diff = [(num_piece_to_color(k),num_piece_to_color(v)) for k,v in my_cube.items() if k != v]
-if len(diff) == 0:
-    print('\n'+' '*4+'The cube is solved :)\t\t\t')
-else:
-    print('\n'+' '*4+'Something is WRONG :(:(:(:(:(:(:(:(:(:(:(:(:(')
+if __name__ == '__main__':
+    main()
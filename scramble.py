@@ -0,0 +1,84 @@
+import random
+
+import numpy as np
+
+from rubik import parity
+from cubie import CubieCube
+from batch import parities, to_dicts
+from cubeio import HEADER, CUBE_MAGIC, FORMAT_VERSION, CUBE_RECORD_SIZE
+
+############################################################
+##  Uniformly random cubes.
+############################################################
+# Instead of making random rotations (like random_cube in rubik.py), a random real cube is picked directly:
+# random permutations of the corners and of the edges, with two edges swapped if their parities differ (this keeps the choice uniform),
+# random twists of 7 corners and flips of 11 edges, the last ones making the sums 0. So every one of the 43252003274489856000 cubes
+# is equally likely, and a cube costs about as much as a few moves.
+#
+# The seed of every function can be anything accepted by numpy.random.default_rng (None, an int, a SeedSequence or a Generator),
+# so the same seed always gives the same cubes (in the same order for random_batch, random_states, stream and write_corpus).
+# substreams gives independent seeds, e.g. one for each worker process.
+
+def substreams(seed, n):
+    '''Return n independent SeedSequences derived from seed (an int or a SeedSequence).'''
+    if not isinstance(seed, np.random.SeedSequence):
+        seed = np.random.SeedSequence(seed)
+    return seed.spawn(n)
+
+def random_cubie(rng=random):
+    '''Return a uniformly random real cube as a CubieCube, using rng (a random.Random, or the random module).'''
+    cp, ep = list(range(8)), list(range(12))
+    rng.shuffle(cp)
+    rng.shuffle(ep)
+    if parity(cp) != parity(ep):
+        ep[0], ep[1] = ep[1], ep[0]
+    co = [rng.randrange(3) for i in range(7)]
+    eo = [rng.randrange(2) for i in range(11)]
+    return CubieCube(cp, co + [-sum(co) % 3], ep, eo + [sum(eo) % 2])
+
+def random_state(rng=random):
+    '''Return a uniformly random real cube as a my_cube-like dict.'''
+    return random_cubie(rng).to_dict()
+
+def random_batch(n, seed=None):
+    '''Return perm, ori (as in batch.py) of n uniformly random real cubes.
+    Each cube is made from its own row of random numbers, so the cubes of a seed don't depend on how they are split into batches.'''
+    rng = np.random.default_rng(seed)
+    u = rng.random((n, 38))
+    cp = np.argsort(u[:, :8], axis=1).astype(np.int8)
+    ep = np.argsort(u[:, 8:20], axis=1).astype(np.int8)
+    swap = parities(cp) != parities(ep)
+    ep[swap, :2] = ep[swap, 1::-1]
+    co = np.zeros((n, 8), dtype=np.int8)
+    co[:, :7] = 3 * u[:, 20:27]
+    co[:, 7] = -co[:, :7].sum(axis=1, dtype=np.int64) % 3
+    eo = np.zeros((n, 12), dtype=np.int8)
+    eo[:, :11] = 2 * u[:, 27:38]
+    eo[:, 11] = eo[:, :11].sum(axis=1, dtype=np.int64) % 2
+    return np.concatenate([cp, ep + 8], axis=1), np.concatenate([co, eo], axis=1)
+
+def random_states(n, seed=None):
+    '''Return a list of n uniformly random real cubes as my_cube-like dicts.'''
+    return list(to_dicts(*random_batch(n, seed)))
+
+def stream(seed=None, chunk_size=4096):
+    '''Yield uniformly random real cubes (my_cube-like dicts) endlessly, the same ones for the same seed.'''
+    rng = np.random.default_rng(seed)
+    while True:
+        yield from to_dicts(*random_batch(chunk_size, rng))
+
+def records(perm, ori):
+    '''Return the cube records (see cubeio.py) of a batch as an (N, 20) uint8 array.'''
+    mult = np.array([3]*8 + [2]*12, dtype=np.uint8)
+    pos = perm.astype(np.uint8)
+    pos[:, 8:] -= 8
+    return pos * mult + ori.astype(np.uint8)
+
+def write_corpus(path, n, seed=None, chunk_size=1 << 20):
+    '''Write n uniformly random real cubes to a binary cube file (readable by cubeio.read_cubes), without converting them to dicts.'''
+    rng = np.random.default_rng(seed)
+    with open(path, 'wb') as f:
+        f.write(HEADER.pack(CUBE_MAGIC, FORMAT_VERSION, CUBE_RECORD_SIZE))
+        for start in range(0, n, chunk_size):
+            f.write(records(*random_batch(min(chunk_size, n - start), rng)).tobytes())
+    return n
@@ -0,0 +1,205 @@
+import argparse
+import ast
+import asyncio
+import json
+import time
+from collections import deque
+
+import rubik
+from cubeio import from_facelets
+from service import SolverPool, solve_chunk
+
+############################################################
+##  A local solving server.
+############################################################
+# The protocol is line based. A request line is either
+#   - a my_cube-like dict in Python notation, e.g. {(1,3,2): (1,3,2), ..., (5,6): (6,5)},
+#   - a 54 character facelet string (see cubeio.py),
+#   - or STATS.
+# The answer to a cube is one line with its solution in the compact notation of print_steps (e.g. W O2 G'), or ERROR and the reason.
+# The answer to STATS is one line of JSON with the number of solved cubes and batches, the queue depth and latency percentiles (in ms).
+# Answers are sent in the order of the requests of the connection.
+# Requests arriving within window seconds (from all connections) are solved together in one batch, by a SolverPool if there is one,
+# otherwise with solver in a thread.
+
+def parse_state(line):
+    '''Parse a request line to a my_cube-like dict.'''
+    if line.startswith('{'):
+        try:
+            state = ast.literal_eval(line)
+        except (SyntaxError, ValueError):
+            raise ValueError('Invalid dict')
+        if not isinstance(state, dict) or set(state) != set(rubik.corners + rubik.edges):
+            raise ValueError('The dict has to have the keys of my_cube')
+        for v in state.values():
+            if not isinstance(v, (tuple, list)) or not all(isinstance(x, int) for x in v):
+                raise ValueError('The values of the dict have to be tuples of side numbers')
+        return {k: tuple(v) for k, v in state.items()}
+    return from_facelets(line)
+
+
+class SolveServer:
+    '''Micro-batching solving server. Serve with serve_unix or serve_tcp.'''
+
+    def __init__(self, solver=rubik.solve, pool=None, window=0.002, max_batch=256, history=10000):
+        self.solver = solver
+        self.pool = pool
+        self.window = window
+        self.max_batch = max_batch
+        self.queue = None
+        self.in_flight = 0
+        self.latencies = deque(maxlen=history)
+        self.solved = 0
+        self.failed = 0
+        self.batches = 0
+
+    async def _batcher(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self.queue.get()]
+            deadline = loop.time() + self.window
+            while len(batch) < self.max_batch:
+                timeout = deadline - loop.time()
+                if timeout <= 0: break
+                try:
+                    batch.append(await asyncio.wait_for(self.queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            self.batches += 1
+            self.in_flight += len(batch)
+            loop.create_task(self._solve_batch(batch))
+
+    def _submit(self, states):
+        # submit may block because of the back-pressure of the pool, so it is called in a thread.
+        futures = [self.pool.submit(state) for state in states]
+        self.pool.flush()
+        return futures
+
+    async def _solve_batch(self, batch):
+        loop = asyncio.get_running_loop()
+        states = [state for state, _ in batch]
+        try:
+            if self.pool is None:
+                results = await loop.run_in_executor(None, solve_chunk, self.solver, states)
+            else:
+                futures = await loop.run_in_executor(None, self._submit, states)
+                results = []
+                for f in futures:
+                    try:
+                        results.append((True, await asyncio.wrap_future(f)))
+                    except Exception as e:
+                        results.append((False, e))
+        except Exception as e:
+            results = [(False, e)] * len(batch)
+        self.in_flight -= len(batch)
+        for (_, future), result in zip(batch, results):
+            if not future.done(): future.set_result(result)
+
+    def stats(self):
+        '''Return the statistics as a dict.'''
+        lat = sorted(self.latencies)
+        def percentile(q):
+            return round(1000 * lat[min(len(lat) - 1, int(q * len(lat)))], 3) if lat else None
+        return {'solved': self.solved, 'failed': self.failed, 'batches': self.batches,
+                'queue_depth': (self.queue.qsize() if self.queue else 0) + self.in_flight,
+                'latency_ms': {'p50': percentile(0.5), 'p90': percentile(0.9), 'p99': percentile(0.99), 'max': percentile(1.0)}}
+
+    async def _answer(self, line):
+        if line.upper() == 'STATS':
+            return json.dumps(self.stats())
+        start = time.perf_counter()
+        try:
+            state = parse_state(line)
+        except ValueError as e:
+            self.failed += 1
+            return 'ERROR ' + str(e)
+        future = asyncio.get_running_loop().create_future()
+        await self.queue.put((state, future))
+        ok, value = await future
+        self.latencies.append(time.perf_counter() - start)
+        if not ok:
+            self.failed += 1
+            return 'ERROR ' + (str(value) or type(value).__name__)
+        self.solved += 1
+        return rubik.compact_notation(value)
+
+    async def _handle(self, reader, writer):
+        # The answers are computed concurrently, but written in the order of the requests.
+        answers = asyncio.Queue()
+
+        async def write_answers():
+            while True:
+                task = await answers.get()
+                if task is None: break
+                try:
+                    answer = await task
+                except Exception as e:
+                    # A failed request must not stop the answers to the later ones.
+                    self.failed += 1
+                    answer = 'ERROR ' + (str(e) or type(e).__name__)
+                writer.write((answer + '\n').encode())
+                await writer.drain()
+
+        writer_task = asyncio.create_task(write_answers())
+        try:
+            while True:
+                line = await reader.readline()
+                if not line: break
+                line = line.decode().strip()
+                if line:
+                    await answers.put(asyncio.create_task(self._answer(line)))
+            await answers.put(None)
+            await writer_task
+        except (ConnectionError, asyncio.CancelledError):
+            # The client went away, or the server is shutting down.
+            writer_task.cancel()
+        finally:
+            writer.close()
+
+    def _start(self):
+        self.queue = asyncio.Queue()
+        return asyncio.create_task(self._batcher())
+
+    async def serve_unix(self, path):
+        batcher = self._start()
+        server = await asyncio.start_unix_server(self._handle, path)
+        async with server:
+            try:
+                await server.serve_forever()
+            finally:
+                batcher.cancel()
+
+    async def serve_tcp(self, host='127.0.0.1', port=8765):
+        batcher = self._start()
+        server = await asyncio.start_server(self._handle, host, port)
+        async with server:
+            try:
+                await server.serve_forever()
+            finally:
+                batcher.cancel()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Local server solving cubes.')
+    parser.add_argument('--unix', help='path of the Unix socket (otherwise TCP on localhost)')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--processes', type=int, default=0, help='number of solver processes (0: solve in a thread)')
+    parser.add_argument('--window', type=float, default=0.002, help='batching window in seconds')
+    parser.add_argument('--max-batch', type=int, default=256)
+    args = parser.parse_args()
+
+    pool = SolverPool(processes=args.processes) if args.processes > 0 else None
+    server = SolveServer(pool=pool, window=args.window, max_batch=args.max_batch)
+    try:
+        if args.unix:
+            asyncio.run(server.serve_unix(args.unix))
+        else:
+            asyncio.run(server.serve_tcp(port=args.port))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if pool is not None: pool.close(cancel=True)
+
+
+if __name__ == '__main__':
+    main()
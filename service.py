@@ -0,0 +1,192 @@
+import asyncio
+import os
+import threading
+from concurrent.futures import CancelledError, Future, ProcessPoolExecutor
+
+import rubik
+
+############################################################
+##  Solving many cubes in a pool of worker processes.
+############################################################
+# The solver is any picklable function mapping a my_cube-like dict to its solution, e.g. rubik.solve (the default),
+# simplify.solve or twophase.solve. It is sent to the workers by reference, so it has to be defined at the top level of a module.
+# warm_up (e.g. twophase.get_tables) is called once in each worker when it starts, so the tables are loaded before the first cube arrives.
+# The states are sent to the workers in chunks of chunk_size cubes, and at most max_pending chunks are in flight at a time:
+# submit and map block (and the async iterator waits) while the limit is reached.
+
+def _init_worker(warm_up):
+    if warm_up is not None:
+        warm_up()
+
+def solve_chunk(solver, states):
+    '''Solve the cubes one by one (in a worker), return a list of (True, solution) or (False, exception) pairs.'''
+    results = []
+    for state in states:
+        try:
+            results.append((True, solver(state)))
+        except Exception as e:
+            results.append((False, e))
+    return results
+
+
+class SolverPool:
+    '''A pool of processes solving cubes. Use it as a context manager, or call close() at the end.'''
+
+    def __init__(self, solver=rubik.solve, processes=None, chunk_size=32, max_pending=None, warm_up=None):
+        self.solver = solver
+        self.processes = processes or os.cpu_count() or 1
+        self.chunk_size = chunk_size
+        self.max_pending = max_pending or 4 * self.processes
+        self._executor = ProcessPoolExecutor(self.processes, initializer=_init_worker, initargs=(warm_up,))
+        self._slots = threading.BoundedSemaphore(self.max_pending)
+        self._lock = threading.Lock()
+        self._buffer = []
+        self._chunks = set()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close(cancel=exc_type is not None)
+
+    def _dispatch(self, states):
+        '''Send a chunk of states to the workers, return the future of its list of results.'''
+        self._slots.acquire()
+        try:
+            chunk = self._executor.submit(solve_chunk, self.solver, states)
+        except BaseException:
+            self._slots.release()
+            raise
+        with self._lock:
+            self._chunks.add(chunk)
+        chunk.add_done_callback(self._chunk_done)
+        return chunk
+
+    def _chunk_done(self, chunk):
+        with self._lock:
+            self._chunks.discard(chunk)
+        self._slots.release()
+
+    def submit(self, state):
+        '''Return a Future of the solution of the cube. The cube is sent to a worker when the chunk is full, or at flush().'''
+        future = Future()
+        with self._lock:
+            self._buffer.append((state, future))
+            if len(self._buffer) < self.chunk_size:
+                return future
+            buffer, self._buffer = self._buffer, []
+        self._dispatch_buffer(buffer)
+        return future
+
+    def flush(self):
+        '''Send the cubes submitted so far to the workers, even if the last chunk is not full.'''
+        with self._lock:
+            buffer, self._buffer = self._buffer, []
+        if buffer:
+            self._dispatch_buffer(buffer)
+
+    def _dispatch_buffer(self, buffer):
+        buffer = [(s, f) for s, f in buffer if f.set_running_or_notify_cancel()]
+        if not buffer: return
+        futures = [f for _, f in buffer]
+        chunk = self._dispatch([s for s, _ in buffer])
+
+        def set_results(chunk):
+            if chunk.cancelled():
+                # The futures are already running (see above), so f.cancel() would do nothing.
+                for f in futures: f.set_exception(CancelledError())
+                return
+            if chunk.exception() is not None:
+                for f in futures: f.set_exception(chunk.exception())
+                return
+            for f, (ok, value) in zip(futures, chunk.result()):
+                if ok: f.set_result(value)
+                else: f.set_exception(value)
+        chunk.add_done_callback(set_results)
+
+    def _chunks_of(self, states):
+        chunk = []
+        for state in states:
+            chunk.append(state)
+            if len(chunk) == self.chunk_size:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+
+    def map(self, states):
+        '''Solve the cubes of an iterable of states, yielding the solutions in order.
+        The states are read lazily, so at most max_pending chunks are held in memory. A failed solve raises its exception here.'''
+        pending = []
+        try:
+            for states_chunk in self._chunks_of(states):
+                # The slots of the pool are freed when a chunk is finished, not when its results are consumed,
+                # so the chunks waiting here are limited too.
+                while len(pending) >= self.max_pending:
+                    yield from _unpack(pending.pop(0).result())
+                pending.append(self._dispatch(states_chunk))
+                while pending and pending[0].done():
+                    yield from _unpack(pending.pop(0).result())
+            while pending:
+                yield from _unpack(pending.pop(0).result())
+        finally:
+            for chunk in pending: chunk.cancel()
+
+    async def map_async(self, states):
+        '''Async iterator version of map. The dispatching (which may block because of back-pressure) runs in a thread.'''
+        loop = asyncio.get_running_loop()
+        queue = asyncio.Queue()
+        stop = threading.Event()
+        # At most max_pending chunks are dispatched and not yet consumed.
+        unconsumed = threading.Semaphore(self.max_pending)
+
+        def feed():
+            try:
+                for states_chunk in self._chunks_of(states):
+                    while not unconsumed.acquire(timeout=0.1):
+                        if stop.is_set(): break
+                    if stop.is_set(): break
+                    chunk = self._dispatch(states_chunk)
+                    loop.call_soon_threadsafe(queue.put_nowait, asyncio.wrap_future(chunk, loop=loop))
+            except BaseException as e:
+                loop.call_soon_threadsafe(queue.put_nowait, e)
+            loop.call_soon_threadsafe(queue.put_nowait, None)
+
+        feeder = loop.run_in_executor(None, feed)
+        try:
+            while True:
+                item = await queue.get()
+                if item is None: break
+                if isinstance(item, BaseException): raise item
+                results = await item
+                unconsumed.release()
+                for solution in _unpack(results):
+                    yield solution
+        finally:
+            stop.set()
+            while not queue.empty():
+                item = queue.get_nowait()
+                if isinstance(item, asyncio.Future): item.cancel()
+            await feeder
+
+    def cancel(self):
+        '''Cancel the submitted cubes which haven't been started by a worker yet.'''
+        with self._lock:
+            buffer, self._buffer = self._buffer, []
+            chunks = list(self._chunks)
+        for _, f in buffer: f.cancel()
+        for chunk in chunks: chunk.cancel()
+
+    def close(self, cancel=False):
+        '''Shut down the workers. If cancel is True, the cubes not started yet are dropped, otherwise they are solved first.'''
+        if cancel:
+            self.cancel()
+        else:
+            self.flush()
+        self._executor.shutdown(wait=True, cancel_futures=cancel)
+
+
+def _unpack(results):
+    for ok, value in results:
+        if not ok: raise value
+        yield value
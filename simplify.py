@@ -0,0 +1,79 @@
+from rubik import solve_stages
+
+############################################################
+##  Simplifying sequences of steps.
+############################################################
+# The steps are CW-rotations given by side numbers, as returned by the functions in rubik.py.
+# Internally a sequence is a list of [side_no, power] pairs with power 1, 2 or 3.
+# Rotations of the same side are merged mod 4 (so inverse rotations cancel), and since rotations of opposite sides (side_no, 7 - side_no) commute,
+# a rotation is also merged with a rotation of the same side lying behind one rotation of the opposite side.
+# Of two neighbouring rotations of opposite sides the smaller side number is put first, so the result is in a normal form.
+
+def to_runs(steps):
+    '''Return the simplified form of steps as a list of [side_no, power] pairs.'''
+    runs = []
+    for s in steps:
+        if runs and runs[-1][0] == s:
+            i = len(runs) - 1
+        elif len(runs) > 1 and runs[-1][0] == 7 - s and runs[-2][0] == s:
+            i = len(runs) - 2
+        else:
+            i = None
+        if i is None:
+            if runs and runs[-1][0] == 7 - s and s < runs[-1][0]:
+                runs.insert(len(runs) - 1, [s, 1])
+            else:
+                runs.append([s, 1])
+        else:
+            runs[i][1] = (runs[i][1] + 1) % 4
+            if runs[i][1] == 0:
+                del runs[i]
+    return runs
+
+def from_runs(runs):
+    '''Convert a list of [side_no, power] pairs to a tuple of CW-rotations.'''
+    steps = []
+    for s, p in runs:
+        steps.extend([s]*p)
+    return tuple(steps)
+
+def simplify(steps):
+    '''Return the simplified steps as a tuple of CW-rotations.
+    Merging one rotation at a time into an already simplified sequence never creates a new simplification further back,
+    so the result can't be simplified any more with the above rules.'''
+    return from_runs(to_runs(steps))
+
+def face_turns(steps):
+    '''Return the number of face turns in steps, counted as print_steps displays them (runs of the same side, without simplification).'''
+    n = 0
+    i = 0
+    while i < len(steps):
+        p = 1
+        while i+p < len(steps) and steps[i+p] == steps[i]:
+            p += 1
+        if p % 4 > 0: n += 1
+        i += p
+    return n
+
+def optimize_stages(stage_steps):
+    '''Simplify the steps of the stages (e.g. STEP 1 - STEP 7 as returned by rubik.solve_stages) one by one, and then across the stage boundaries.
+    Return the simplified steps of the whole solution as a tuple, and a report dict of the number of face turns saved
+    (a face turn is one instruction of the compact notation of print_steps, like W, W2 or W').'''
+    stages = []
+    simplified = []
+    for i, steps in enumerate(stage_steps):
+        s = simplify(steps)
+        simplified.extend(s)
+        before, after = face_turns(steps), face_turns(s)
+        stages.append({'stage': i + 1, 'before': before, 'after': after, 'saved': before - after})
+    result = simplify(simplified)
+    before = sum(face_turns(steps) for steps in stage_steps)
+    after = face_turns(result)
+    report = {'stages': stages, 'across_stages': sum(st['after'] for st in stages) - after,
+              'before': before, 'after': after, 'saved': before - after,
+              'quarter_turns_before': sum(len(steps) for steps in stage_steps), 'quarter_turns_after': len(result)}
+    return result, report
+
+def solve(state):
+    '''Return the simplified steps of rubik.solve, and the report of optimize_stages.'''
+    return optimize_stages(solve_stages(state))
@@ -0,0 +1,160 @@
+import os
+import threading
+from collections import OrderedDict
+
+import rubik
+from rubik import corners, edges, cw_sides, key_form, find_orient, PIECE_VALUES, check_cube
+from cubie import steps_to_moves, moves_to_steps
+from cubeio import CUBE_RECORD_SIZE, SOLUTION_RECORD, pack_solution, unpack_solution, write_records, read_records
+
+############################################################
+##  Symmetries of the cube.
+############################################################
+# A symmetry is a permutation of the side numbers keeping opposite sides opposite: the 24 rotations of the whole cube
+# (one for each find_orient(U_no, F_no)) and their mirror images (the rotations composed with swapping Orange and Red).
+# Applying a symmetry to a cube moves the piece at each position to the image of the position, and recolors it with the same permutation,
+# so the solved cube stays solved. If steps solve a cube, then the image of the steps solves the image of the cube:
+# a CW-rotation of side x becomes a CW-rotation of the image of x, or for a mirror image an ACW-rotation.
+# The canonical form of a cube is the smallest of the cube records (see cubeio.py) of its 48 images.
+
+def _symmetries():
+    '''Return the 48 symmetries as (dict side_no -> side_no, True for a rotation and False for a mirror image), the identity first.'''
+    base = find_orient(U_no=1, F_no=3)
+    rotations = []
+    for U_no in range(1,7):
+        for F_no in cw_sides(U_no):
+            orient_to_num = find_orient(U_no=U_no, F_no=F_no)
+            rotations.append({base[f]: orient_to_num[f] for f in 'URFDLB'})
+    rotations.sort(key=lambda sym: sym != {s: s for s in range(1,7)})
+    mirror = {1:1, 2:5, 3:3, 4:4, 5:2, 6:6}
+    return [(sym, True) for sym in rotations] + [({s: sym[mirror[s]] for s in sym}, False) for sym in rotations]
+
+SYMMETRIES = _symmetries()
+
+def _record_byte(value):
+    i, p = PIECE_VALUES[value]
+    return 3*i + p if len(value) == 3 else 2*i + p
+
+def _position_table(sym):
+    '''Return the dict (key, value) -> (index of the image position in corners + edges, record byte of the image value) of a symmetry.'''
+    positions = corners + edges
+    table = {}
+    for k in positions:
+        image = tuple([sym[s] for s in k])
+        key = key_form(image)
+        order = [image.index(s) for s in key]
+        for value in PIECE_VALUES:
+            if len(value) == len(k):
+                table[(k, value)] = (positions.index(key), _record_byte(tuple([sym[value[i]] for i in order])))
+    return table
+
+POSITION_TABLES = [_position_table(sym) for sym, _ in SYMMETRIES]
+# The image of a CW-rotation of each side under each symmetry.
+STEP_TABLES = [{s: (sym[s],) if rotation else (sym[s],)*3 for s in sym} for sym, rotation in SYMMETRIES]
+# The number of the inverse of each symmetry.
+INVERSES = [[s for s, (other, _) in enumerate(SYMMETRIES) if other == {v: k for k, v in sym.items()}][0] for sym, _ in SYMMETRIES]
+
+def image_record(state_of_cube, sym_no):
+    '''Return the cube record (see cubeio.py) of the image of a cube under the symmetry SYMMETRIES[sym_no].'''
+    table = POSITION_TABLES[sym_no]
+    record = bytearray(CUBE_RECORD_SIZE)
+    for kv in state_of_cube.items():
+        pos, b = table[kv]
+        record[pos] = b
+    return bytes(record)
+
+def canonical(state_of_cube):
+    '''Return the canonical record of a cube and the number of the symmetry taking the cube to it.
+    The cube has to be a real cube (see check_cube).'''
+    return min((image_record(state_of_cube, sym_no), sym_no) for sym_no in range(len(SYMMETRIES)))
+
+def image_steps(steps, sym_no):
+    '''Return the image of steps (CW-rotations) under the symmetry SYMMETRIES[sym_no].'''
+    table = STEP_TABLES[sym_no]
+    return moves_to_steps(steps_to_moves([t for s in steps for t in table[s]]))
+
+
+
+############################################################
+##  The cache.
+############################################################
+# The file of a cache is a header and records as in cubeio.py, each record being a canonical cube record and the solution record of it,
+# from the least recently used to the most recently used entry.
+
+CACHE_MAGIC = b'RUBIKSLC'
+CACHE_RECORD_SIZE = CUBE_RECORD_SIZE + SOLUTION_RECORD.size
+
+class SolutionCache:
+    '''A bounded LRU cache of solutions in front of solver, shared by the symmetric images of the cubes.
+    solve can be used as a solver itself (e.g. for SolveServer). It is thread-safe.
+    If path is given, the cache is loaded from it (if it exists), and save() writes it back there.'''
+
+    def __init__(self, solver=rubik.solve, maxsize=100000, path=None):
+        self.solver = solver
+        self.maxsize = maxsize
+        self.path = path
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        if path is not None and os.path.exists(path):
+            self.load(path)
+
+    def __len__(self):
+        return len(self.entries)
+
+    def _put(self, record, steps):
+        self.entries[record] = steps
+        self.entries.move_to_end(record)
+        while len(self.entries) > self.maxsize:
+            self.entries.popitem(last=False)
+            self.evictions += 1
+
+    def solve(self, state):
+        '''Return the steps solving the cube, from the cache if a symmetric image of the cube was solved before,
+        or None if the solver returns None. Raise InvalidCubeError if the state is not a real mixed cube.'''
+        check_cube(state)
+        record, sym_no = canonical(state)
+        with self._lock:
+            steps = self.entries.get(record)
+            if steps is not None:
+                self.entries.move_to_end(record)
+                self.hits += 1
+        if steps is not None:
+            return image_steps(steps, INVERSES[sym_no])
+        steps = self.solver(state)
+        with self._lock:
+            self.misses += 1
+            # A solver may give up (e.g. twophase.solve when its time budget runs out), that is not cached.
+            if steps is not None:
+                self._put(record, image_steps(steps, sym_no))
+        return steps
+
+    def clear(self):
+        with self._lock:
+            self.entries.clear()
+
+    def stats(self):
+        '''Return the counters as a dict.'''
+        with self._lock:
+            return {'size': len(self.entries), 'maxsize': self.maxsize,
+                    'hits': self.hits, 'misses': self.misses, 'evictions': self.evictions}
+
+    def save(self, path=None):
+        '''Write the entries to path (self.path by default). The file is replaced atomically.'''
+        path = self.path if path is None else path
+        with self._lock:
+            items = list(self.entries.items())
+        tmp_path = path + '.tmp'
+        write_records(tmp_path, CACHE_MAGIC, CACHE_RECORD_SIZE, (record + pack_solution(steps) for record, steps in items))
+        os.replace(tmp_path, path)
+
+    def load(self, path):
+        '''Add the entries of a file written by save (the ones over maxsize are evicted, as usual). Return the number of entries read.'''
+        n = 0
+        with self._lock:
+            for record in read_records(path, CACHE_MAGIC, CACHE_RECORD_SIZE):
+                self._put(record[:CUBE_RECORD_SIZE], unpack_solution(record[CUBE_RECORD_SIZE:]))
+                n += 1
+        return n
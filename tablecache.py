@@ -0,0 +1,99 @@
+import hashlib
+import json
+import os
+import struct
+import tempfile
+import zlib
+
+import numpy as np
+
+from rubik import corners, edges, cw_sides
+
+############################################################
+##  Storing precomputed tables in a file, and loading them memory-mapped.
+############################################################
+# File layout (little-endian):
+#   header    - magic, format version, CRC32 of everything after the header, fingerprint (32 bytes), length of the directory
+#   directory - JSON list of {"name", "dtype", "shape", "offset"}, offsets counted from the start of the data
+#   data      - the arrays one after the other, each aligned to ALIGN bytes
+# The fingerprint is a SHA-256 of the key of the tables (name and version given by the module building them)
+# and of the piece definitions the tables are derived from, so changing any of them makes the file stale.
+# The arrays of a loaded file are read-only views into one numpy.memmap, hence processes loading the same file share its pages.
+
+MAGIC = b'RUBIKTBL'
+FORMAT_VERSION = 1
+HEADER = struct.Struct('<8sII32sI')
+ALIGN = 64
+
+def fingerprint(key):
+    '''Return the fingerprint of tables with the given key, derived from the piece definitions in rubik.py.'''
+    source = repr( (key, corners, edges, tuple(cw_sides(s) for s in range(1,7))) )
+    return hashlib.sha256(source.encode()).digest()
+
+def save_tables(path, tables, key):
+    '''Write a dict of NumPy arrays to path. The file is replaced atomically, so readers never see a half-written file.'''
+    directory = []
+    offset = 0
+    for name, arr in tables.items():
+        directory.append({'name': name, 'dtype': np.dtype(arr.dtype).str, 'shape': list(arr.shape), 'offset': offset})
+        offset += -(-arr.nbytes // ALIGN) * ALIGN
+    dir_bytes = json.dumps(directory).encode()
+    dir_bytes += b' ' * (-(HEADER.size + len(dir_bytes)) % ALIGN)
+
+    crc = zlib.crc32(dir_bytes)
+    chunks = []
+    for arr in tables.values():
+        chunk = np.ascontiguousarray(arr).tobytes()
+        chunk += bytes(-len(chunk) % ALIGN)
+        crc = zlib.crc32(chunk, crc)
+        chunks.append(chunk)
+
+    folder = os.path.dirname(os.path.abspath(path))
+    os.makedirs(folder, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=folder, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(HEADER.pack(MAGIC, FORMAT_VERSION, crc, fingerprint(key), len(dir_bytes)))
+            f.write(dir_bytes)
+            for chunk in chunks: f.write(chunk)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+def load_tables(path, key, verify=True):
+    '''Load the tables written by save_tables as read-only arrays backed by a memory map.
+    Raise ValueError if the file is not a table file, was written by another format version, belongs to other tables/piece definitions,
+    or (if verify is True) its checksum is wrong.'''
+    mm = np.memmap(path, dtype=np.uint8, mode='r')
+    if len(mm) < HEADER.size:
+        raise ValueError('Truncated table file: ' + str(path))
+    magic, version, crc, fp, dir_len = HEADER.unpack(mm[:HEADER.size].tobytes())
+    if magic != MAGIC:
+        raise ValueError('Not a table file: ' + str(path))
+    if version != FORMAT_VERSION:
+        raise ValueError('Table file format version %d instead of %d: %s' % (version, FORMAT_VERSION, path))
+    if fp != fingerprint(key):
+        raise ValueError('Stale table file: ' + str(path))
+    if verify and zlib.crc32(mm[HEADER.size:]) != crc:
+        raise ValueError('Wrong checksum in table file: ' + str(path))
+    directory = json.loads(mm[HEADER.size:HEADER.size + dir_len].tobytes())
+    data_start = HEADER.size + dir_len
+    tables = {}
+    for entry in directory:
+        dtype = np.dtype(entry['dtype'])
+        count = int(np.prod(entry['shape']))
+        offset = data_start + entry['offset']
+        if offset + count * dtype.itemsize > len(mm):
+            raise ValueError('Truncated table file: ' + str(path))
+        tables[entry['name']] = np.frombuffer(mm, dtype=dtype, count=count, offset=offset).reshape(entry['shape'])
+    return tables
+
+def cached_tables(path, key, build, verify=True):
+    '''Load the tables from path, or if it is missing, stale or corrupt, compute them with build() and save them to path first.'''
+    try:
+        return load_tables(path, key, verify)
+    except (OSError, ValueError):
+        pass
+    save_tables(path, build(), key)
+    return load_tables(path, key, verify=False)
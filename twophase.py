@@ -0,0 +1,275 @@
+import os
+import time
+from itertools import combinations, permutations
+
+import numpy as np
+
+from rubik import check_cube
+from cubie import CubieCube, MOVE_CUBES, N_MOVES, moves_to_steps
+from tablecache import cached_tables
+
+############################################################
+##  Two-phase solver (Kociemba's algorithm).
+############################################################
+# The White (1) and Yellow (6) sides play the role of U and D, and the middle edges (2,4), (4,5), (3,5), (2,3) form the UD-slice.
+# Phase 1 takes the cube into the subgroup G1 = <W, Y, O2, G2, B2, R2> with any moves,
+# phase 2 solves the cube inside G1 using only the moves of G1.
+# The length of a solution is counted in face turns (a half turn is one move), the returned steps are CW-rotations as in rubik.py.
+#
+# Coordinates (all of them are 0 for the solved cube, except slice):
+#   twist       - orientation of the corners 0-6 in base 3 (0 - 2186)
+#   flip        - orientation of the edges 0-10 in base 2 (0 - 2047), see below
+#   slice       - the set of positions of the middle edges (0 - 494)
+#   corner_perm - permutation of the corners (0 - 40319)
+#   ud_edge_perm - permutation of the White and Yellow edges, only inside G1 (0 - 40319)
+#   slice_perm  - permutation of the middle edges, only inside G1 (0 - 23)
+#
+# The orientation of the edges in the dict/CubieCube (eo) is relative to the smaller side number of the edge, which is not kept by the moves of G1.
+# For the flip coordinate we use the usual convention instead: an edge is well-oriented if its White/Yellow color (or if it has none, its Orange/Red color)
+# is on the White/Yellow side (or if the edge is in the middle layer, on the Orange/Red side). With this, only the quarter turns of Orange and Red flip edges.
+# It differs from eo by a term depending only on the position and the piece, which is REF[position] ^ REF[piece].
+
+REF = (0,0,0,0, 0,1,1,0, 1,1,1,1)
+SLICE_EDGES = (4,5,6,7)
+UD_EDGES = (0,1,2,3,8,9,10,11)
+PHASE_2_MOVES = (0,1,2,4,7,10,13,15,16,17)
+
+N_TWIST = 2187
+N_FLIP = 2048
+N_SLICE = 495
+N_PERM_8 = 40320
+N_PERM_4 = 24
+
+SLICE_COMBINATIONS = tuple(combinations(range(12), 4))
+SLICE_INDEX = {c: i for i, c in enumerate(SLICE_COMBINATIONS)}
+SLICE_SOLVED = SLICE_INDEX[SLICE_EDGES]
+FACTORIAL = (1, 1, 2, 6, 24, 120, 720, 5040)
+
+def perm_rank(perm):
+    '''Return the index of the permutation in lexicographic order.'''
+    n = len(perm)
+    rank = 0
+    for i in range(n-1):
+        rank += sum(1 for j in range(i+1, n) if perm[j] < perm[i]) * FACTORIAL[n-1-i]
+    return rank
+
+def twist(cc):
+    t = 0
+    for i in range(7): t = 3*t + cc.co[i]
+    return t
+
+def flip(cc):
+    f = 0
+    for i in range(11): f = 2*f + (cc.eo[i] ^ REF[i] ^ REF[cc.ep[i]])
+    return f
+
+def slice_coord(cc):
+    return SLICE_INDEX[tuple(i for i in range(12) if cc.ep[i] in SLICE_EDGES)]
+
+def corner_perm(cc):
+    return perm_rank(cc.cp)
+
+def ud_edge_perm(cc):
+    return perm_rank([UD_EDGES.index(cc.ep[i]) for i in UD_EDGES])
+
+def slice_perm(cc):
+    return perm_rank([cc.ep[i] - 4 for i in SLICE_EDGES])
+
+
+
+############################################################
+##  Move and pruning tables.
+############################################################
+
+def _twist_move_table():
+    table = np.empty((N_TWIST, N_MOVES), dtype=np.uint16)
+    for t in range(N_TWIST):
+        co = [(t // 3**(6-i)) % 3 for i in range(7)]
+        co.append(-sum(co) % 3)
+        for m, mc in enumerate(MOVE_CUBES):
+            new_t = 0
+            for i in range(7): new_t = 3*new_t + (co[mc.cp[i]] + mc.co[i]) % 3
+            table[t, m] = new_t
+    return table
+
+def _flip_move_table():
+    table = np.empty((N_FLIP, N_MOVES), dtype=np.uint16)
+    deltas = [[mc.eo[i] ^ REF[i] ^ REF[mc.ep[i]] for i in range(12)] for mc in MOVE_CUBES]
+    for f in range(N_FLIP):
+        eo = [(f >> (10-i)) & 1 for i in range(11)]
+        eo.append(sum(eo) % 2)
+        for m, mc in enumerate(MOVE_CUBES):
+            new_f = 0
+            for i in range(11): new_f = 2*new_f + (eo[mc.ep[i]] ^ deltas[m][i])
+            table[f, m] = new_f
+    return table
+
+def _slice_move_table():
+    table = np.empty((N_SLICE, N_MOVES), dtype=np.uint16)
+    for s, comb in enumerate(SLICE_COMBINATIONS):
+        for m, mc in enumerate(MOVE_CUBES):
+            table[s, m] = SLICE_INDEX[tuple(i for i in range(12) if mc.ep[i] in comb)]
+    return table
+
+def _perm_ranks(perms):
+    '''Vectorized perm_rank of the rows of perms.'''
+    n = perms.shape[1]
+    rank = np.zeros(len(perms), dtype=np.int64)
+    for i in range(n-1):
+        rank += (perms[:, i+1:] < perms[:, i:i+1]).sum(axis=1) * FACTORIAL[n-1-i]
+    return rank
+
+def _perm_move_table(n, sources):
+    '''Move table of the permutations of n elements, where sources[j] is the source position list of the j-th phase 2 move.'''
+    perms = np.array(list(permutations(range(n))), dtype=np.int8)
+    table = np.empty((len(perms), len(sources)), dtype=np.uint16)
+    for j, src in enumerate(sources):
+        table[:, j] = _perm_ranks(perms[:, src])
+    return table
+
+def _pruning_table(move_a, move_b, goal):
+    '''Breadth-first search from goal on the product of two coordinates.
+    The entry a*len(move_b)+b is the number of moves needed to take (a, b) to goal.'''
+    n_a, n_b = len(move_a), len(move_b)
+    table = np.full(n_a * n_b, 255, dtype=np.uint8)
+    table[goal] = 0
+    move_a, move_b = move_a.astype(np.int64), move_b.astype(np.int64)
+    depth = 0
+    while True:
+        frontier = np.flatnonzero(table == depth)
+        if len(frontier) == 0: break
+        a, b = np.divmod(frontier, n_b)
+        for m in range(move_a.shape[1]):
+            neighbours = move_a[a, m] * n_b + move_b[b, m]
+            neighbours = neighbours[table[neighbours] == 255]
+            table[neighbours] = depth + 1
+        depth += 1
+    return table
+
+def build_tables():
+    '''Compute all the move and pruning tables, return them as a dict of NumPy arrays.'''
+    twist_move = _twist_move_table()
+    flip_move = _flip_move_table()
+    slice_move = _slice_move_table()
+    p2_cubes = [MOVE_CUBES[m] for m in PHASE_2_MOVES]
+    corner_perm_move = _perm_move_table(8, [list(mc.cp) for mc in p2_cubes])
+    ud_edge_perm_move = _perm_move_table(8, [[UD_EDGES.index(mc.ep[i]) for i in UD_EDGES] for mc in p2_cubes])
+    slice_perm_move = _perm_move_table(4, [[mc.ep[i] - 4 for i in SLICE_EDGES] for mc in p2_cubes])
+    return {
+        'twist_move': twist_move,
+        'flip_move': flip_move,
+        'slice_move': slice_move,
+        'corner_perm_move': corner_perm_move,
+        'ud_edge_perm_move': ud_edge_perm_move,
+        'slice_perm_move': slice_perm_move,
+        'slice_twist_prune': _pruning_table(slice_move, twist_move, SLICE_SOLVED * N_TWIST),
+        'slice_flip_prune': _pruning_table(slice_move, flip_move, SLICE_SOLVED * N_FLIP),
+        'corner_slice_perm_prune': _pruning_table(corner_perm_move, slice_perm_move, 0),
+        'edge_slice_perm_prune': _pruning_table(ud_edge_perm_move, slice_perm_move, 0),
+    }
+
+# The tables are stored in TABLE_PATH (or in the file given by the RUBIK_TABLES environment variable) after they are computed the first time.
+# TABLES_KEY has to be changed whenever build_tables changes.
+TABLES_KEY = ('twophase', 1)
+TABLE_PATH = os.environ.get('RUBIK_TABLES', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'twophase_tables.bin'))
+
+_tables = None
+
+def get_tables(path=None):
+    '''Return the tables as a dict of flat memoryviews (fast to index from Python).
+    At the first call they are loaded memory-mapped from path (TABLE_PATH by default), or computed and saved there if the file is missing or stale.'''
+    global _tables
+    if _tables is None:
+        arrays = cached_tables(TABLE_PATH if path is None else path, TABLES_KEY, build_tables)
+        _tables = {name: memoryview(arr.reshape(-1)) for name, arr in arrays.items()}
+    return _tables
+
+
+
+############################################################
+##  The search.
+############################################################
+
+class _Timeout(Exception):
+    pass
+
+def search(cc, max_length=20, time_budget=10.0, tables=None):
+    '''Return the shortest solution (list of move numbers) found for the CubieCube cc.
+    The search stops as soon as a solution of at most max_length moves is found, or when time_budget seconds are over,
+    and in the latter case the best solution found so far is returned (None if there is none).'''
+    T = get_tables() if tables is None else tables
+    twist_move, flip_move, slice_move = T['twist_move'], T['flip_move'], T['slice_move']
+    cp_move, ep_move, sp_move = T['corner_perm_move'], T['ud_edge_perm_move'], T['slice_perm_move']
+    slice_twist_prune, slice_flip_prune = T['slice_twist_prune'], T['slice_flip_prune']
+    corner_prune, edge_prune = T['corner_slice_perm_prune'], T['edge_slice_perm_prune']
+    deadline = time.perf_counter() + time_budget
+    path = []
+    best = []
+    nodes = [0]
+    phase_2_allowed = [m in PHASE_2_MOVES for m in range(N_MOVES)]
+
+    def phase_2(cp, ep, sp, togo, last_face):
+        if togo == 0:
+            return cp == 0 and ep == 0 and sp == 0
+        nodes[0] += 1
+        if nodes[0] & 1023 == 0 and time.perf_counter() > deadline: raise _Timeout
+        for j, m in enumerate(PHASE_2_MOVES):
+            face = m // 3
+            if face == last_face or (face == 5 - last_face and face < last_face): continue
+            cp_1, ep_1, sp_1 = cp_move[10*cp + j], ep_move[10*ep + j], sp_move[10*sp + j]
+            if corner_prune[24*cp_1 + sp_1] >= togo or edge_prune[24*ep_1 + sp_1] >= togo: continue
+            path.append(m)
+            if phase_2(cp_1, ep_1, sp_1, togo - 1, face): return True
+            path.pop()
+        return False
+
+    def start_phase_2():
+        c = cc.copy()
+        c.apply(path)
+        cp, ep, sp = corner_perm(c), ud_edge_perm(c), slice_perm(c)
+        limit = min(18, (best[0] if best else 100) - 1 - len(path))
+        last_face = path[-1] // 3 if path else -1
+        depth = max(corner_prune[24*cp + sp], edge_prune[24*ep + sp])
+        n = len(path)
+        while depth <= limit:
+            if phase_2(cp, ep, sp, depth, last_face):
+                best[:] = [len(path), list(path)]
+                del path[n:]
+                return
+            depth += 1
+
+    def phase_1(tw, fl, sl, togo, last_face):
+        if togo == 0:
+            start_phase_2()
+            return best and best[0] <= max_length
+        nodes[0] += 1
+        if nodes[0] & 1023 == 0 and time.perf_counter() > deadline: raise _Timeout
+        for m in range(N_MOVES):
+            face = m // 3
+            if face == last_face or (face == 5 - last_face and face < last_face): continue
+            if togo == 1 and phase_2_allowed[m]: continue
+            tw_1, fl_1, sl_1 = twist_move[18*tw + m], flip_move[18*fl + m], slice_move[18*sl + m]
+            if slice_twist_prune[N_TWIST*sl_1 + tw_1] >= togo or slice_flip_prune[N_FLIP*sl_1 + fl_1] >= togo: continue
+            path.append(m)
+            done = phase_1(tw_1, fl_1, sl_1, togo - 1, face)
+            path.pop()
+            if done: return True
+        return False
+
+    tw, fl, sl = twist(cc), flip(cc), slice_coord(cc)
+    depth = max(slice_twist_prune[N_TWIST*sl + tw], slice_flip_prune[N_FLIP*sl + fl])
+    try:
+        while not best or depth < best[0]:
+            if phase_1(tw, fl, sl, depth, -1): break
+            depth += 1
+    except _Timeout:
+        pass
+    return best[1] if best else None
+
+def solve(state, max_length=20, time_budget=10.0):
+    '''Return the steps (CW-rotations, as in rubik.solve) solving the cube given by a my_cube-like dict, using the two-phase algorithm.
+    See search for max_length and time_budget. Return None if no solution was found in time.
+    Raise InvalidCubeError if the state is not a real cube (see rubik.check_cube).'''
+    check_cube(state)
+    moves = search(CubieCube.from_dict(state), max_length, time_budget)
+    return None if moves is None else moves_to_steps(moves)
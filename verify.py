@@ -0,0 +1,55 @@
+import numpy as np
+
+import batch
+from cubie import CubieCube
+
+############################################################
+##  Checking move sequences.
+############################################################
+# A sequence of steps (CW-rotations, as returned by the solver functions) is compiled into one transformation, a CubieCube
+# (see cubie.py), so sequences are compared, inverted, composed (with *) and checked against cubes without replaying the steps on a dict.
+# The functions for many sequences at once (the logged scrambles and solutions) do the same with the batch arrays of batch.py.
+
+def transform(steps):
+    '''Return the transformation (CubieCube) of the steps.'''
+    return CubieCube.from_steps(steps)
+
+def equivalent(steps, other_steps):
+    '''Return True if the two sequences of steps have the same effect on every cube.'''
+    return transform(steps) == transform(other_steps)
+
+def order(steps):
+    '''Return the number of times the steps have to be repeated to get back to the starting cube.'''
+    return transform(steps).order()
+
+def solves(state, steps):
+    '''Return True if the steps solve the cube (a my_cube-like dict).'''
+    return (CubieCube.from_dict(state) * transform(steps)).is_solved()
+
+def solves_scramble(scramble, solution):
+    '''Return True if the steps of solution solve the cube mixed by the steps of scramble (starting from the solved cube).'''
+    return (transform(scramble) * transform(solution)).is_solved()
+
+def _verify(perm, ori, solutions):
+    return batch.is_solved(*batch.apply_sequences(perm, ori, batch.pad_sequences(solutions)))
+
+def verify_log(scrambles, solutions, chunk_size=65536):
+    '''Return a boolean array telling which solutions solve the cube mixed by the scramble in the same place (both sequences of steps).'''
+    if len(scrambles) != len(solutions):
+        raise ValueError('%d scrambles and %d solutions' % (len(scrambles), len(solutions)))
+    result = np.zeros(len(scrambles), dtype=bool)
+    for lo in range(0, len(scrambles), chunk_size):
+        part = scrambles[lo:lo+chunk_size]
+        perm, ori = batch.apply_sequences(*batch.solved(len(part)), batch.pad_sequences(part))
+        result[lo:lo+chunk_size] = _verify(perm, ori, solutions[lo:lo+chunk_size])
+    return result
+
+def verify_solutions(states, solutions, chunk_size=65536):
+    '''Return a boolean array telling which solutions solve the cube (a my_cube-like dict) in the same place.'''
+    if len(states) != len(solutions):
+        raise ValueError('%d states and %d solutions' % (len(states), len(solutions)))
+    result = np.zeros(len(states), dtype=bool)
+    for lo in range(0, len(states), chunk_size):
+        perm, ori = batch.from_dicts(states[lo:lo+chunk_size])
+        result[lo:lo+chunk_size] = _verify(perm, ori, solutions[lo:lo+chunk_size])
+    return result